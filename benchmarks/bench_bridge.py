@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Load test for the start_server.py WebSocket bridge
+Starts the bridge in-process (on its own thread and event loop), connects N
+simulated TD components and K simulated browsers on localhost and reports:
+  - latency of browser set_source -> browser source_changed (p50/p99)
+  - messages/s and bytes/s received by the simulated clients
+  - bridge thread CPU usage and process RSS
+
+The simulated components speak the same protocol as NDINamedRouterExt's
+WebHandler: state_update on connect and on request_state, and on set_source
+a source_changed followed by a full state_update.
+
+Clients and bridge share one Python process (and the GIL), so treat the
+numbers as a regression/sizing baseline, not an absolute capacity. With
+--workers the browsers are served by bridge worker processes instead, and
+their CPU time is reported separately (needs psutil).
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import multiprocessing
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+
+import start_server
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+class Traffic:
+    """Messages and bytes received by the simulated clients"""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def count(self, message):
+        self.messages += 1
+        self.bytes += len(message)
+
+class BridgeThread:
+    """Run the bridge's WebSocket servers on a dedicated thread and event loop"""
+
+    def __init__(self, browser_port, td_port):
+        self.browser_port = browser_port
+        self.td_port = td_port
+        self.loop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_until_complete(start_server.run_websocket_servers(self.browser_port, self.td_port))
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def call(self, func):
+        """Run func on the bridge thread and return its result"""
+        async def wrapper():
+            return func()
+        return asyncio.run_coroutine_threadsafe(wrapper(), self.loop).result()
+
+    def cpu_time(self):
+        return self.call(time.thread_time)
+
+class FakeComponent:
+    """Simulated TD component speaking the NDINamedRouterExt WebHandler protocol"""
+
+    def __init__(self, index, num_outputs, sources, traffic, use_msgpack=False):
+        self.component_id = f'Bench_{index}'
+        self.use_msgpack = use_msgpack
+        self.sources = sources
+        self.output_names = [f'Output {index}.{i}' for i in range(num_outputs)]
+        self.current_sources = [sources[i % len(sources)] for i in range(num_outputs)]
+        self.traffic = traffic
+        self.websocket = None
+
+    def state(self):
+        num_outputs = len(self.output_names)
+        return {
+            'component_id': self.component_id,
+            'component_name': self.component_id,
+            'machine_id': 'bench',
+            'sources': self.sources,
+            'local_only_sources': [],
+            'output_names': self.output_names,
+            'current_sources': self.current_sources,
+            'regex_patterns': [f'.*_{name}' for name in self.output_names],
+            'effective_regex_patterns': [f'.*_{name}s?\\)?' for name in self.output_names],
+            'plural_handling_enabled': True,
+            'output_resolutions': [[1920, 1080]] * num_outputs,
+            'lock_global': False,
+            'locks': [False] * num_outputs,
+            'last_update': time.time()
+        }
+
+    async def send(self, payload):
+        if self.use_msgpack:
+            await self.websocket.send(msgpack.packb(payload, use_bin_type=True))
+        else:
+            await self.websocket.send(json.dumps(payload))
+
+    async def send_state(self):
+        await self.send({'action': 'state_update', 'state': self.state()})
+
+    async def run(self, url, connected):
+        async with websockets.connect(url, max_size=None) as websocket:
+            self.websocket = websocket
+            if self.use_msgpack:
+                await websocket.send(json.dumps({'action': 'register_client', 'encoding': 'msgpack'}))
+            await self.send_state()
+            connected.release()
+            async for message in websocket:
+                self.traffic.count(message)
+                data = msgpack.unpackb(message) if isinstance(message, bytes) else json.loads(message)
+                action = data.get('action')
+                if data.get('component_id') not in (None, self.component_id):
+                    continue
+                if action == 'request_state':
+                    await self.send_state()
+                elif action == 'set_source':
+                    block_idx = data['block_idx']
+                    self.current_sources[block_idx] = data['source_name']
+                    await self.send({
+                        'action': 'source_changed',
+                        'component_id': self.component_id,
+                        'block_idx': block_idx,
+                        'source_name': data['source_name']
+                    })
+                    await self.send_state()
+
+class FakeBrowser:
+    """Simulated web interface issuing set_source and timing the source_changed echo"""
+
+    def __init__(self, index, targets, sources, traffic, patches, interval):
+        self.index = index
+        self.targets = targets  # (component_id, block_idx) pairs this browser drives
+        self.sources = sources
+        self.traffic = traffic
+        self.patches = patches
+        self.interval = interval
+        self.latencies = []
+        self.timeouts = 0
+        self._pending = {}
+
+    async def _reader(self, websocket):
+        async for message in websocket:
+            self.traffic.count(message)
+            if '"source_changed"' not in message:
+                continue
+            data = json.loads(message)
+            key = (data.get('component_id'), data.get('block_idx'), data.get('source_name'))
+            waiter = self._pending.pop(key, None)
+            if waiter and not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+    async def run(self, url, stop_at):
+        rng = random.Random(self.index)
+        async with websockets.connect(url, max_size=None) as websocket:
+            reader = asyncio.create_task(self._reader(websocket))
+            await websocket.send(json.dumps({'action': 'register_client', 'client_type': 'browser', 'patches': self.patches}))
+            loop = asyncio.get_running_loop()
+            while time.perf_counter() < stop_at and self.targets:
+                component_id, block_idx = rng.choice(self.targets)
+                source_name = rng.choice(self.sources)
+                key = (component_id, block_idx, source_name)
+                waiter = loop.create_future()
+                self._pending[key] = waiter
+                sent_at = time.perf_counter()
+                await websocket.send(json.dumps({
+                    'action': 'set_source',
+                    'component_id': component_id,
+                    'block_idx': block_idx,
+                    'source_name': source_name
+                }))
+                try:
+                    received_at = await asyncio.wait_for(waiter, 5)
+                    self.latencies.append(received_at - sent_at)
+                except asyncio.TimeoutError:
+                    self._pending.pop(key, None)
+                    self.timeouts += 1
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+            reader.cancel()
+
+async def run_browsers(browser_targets, sources, patches, interval, duration, url):
+    """Run simulated browsers for duration seconds and return their results"""
+    traffic = Traffic()
+    browsers = [FakeBrowser(i, targets, sources, traffic, patches, interval) for i, targets in browser_targets]
+    started = time.perf_counter()
+    await asyncio.gather(*(browser.run(url, started + duration) for browser in browsers))
+    return {
+        'wall': time.perf_counter() - started,
+        'latencies': [lat for browser in browsers for lat in browser.latencies],
+        'timeouts': sum(browser.timeouts for browser in browsers),
+        'messages': traffic.messages,
+        'bytes': traffic.bytes,
+    }
+
+def run_browser_group(*args):
+    """run_browsers() in a client process"""
+    return asyncio.run(run_browsers(*args))
+
+def worker_cpu_time(processes):
+    """CPU seconds used so far by the bridge's worker processes"""
+    total = 0.0
+    for child in processes:
+        with contextlib.suppress(psutil.Error):
+            times = child.cpu_times()
+            total += times.user + times.system
+    return total
+
+async def run_clients(args, browser_port, td_port, bridge):
+    traffic = Traffic()
+    rng = random.Random(args.seed)
+    source_pool = [f'HOST{i // 4} (Source_{i})' for i in range(max(args.sources * 2, 1))]
+
+    components = [
+        FakeComponent(i, args.outputs, rng.sample(source_pool, args.sources), traffic, args.msgpack)
+        for i in range(args.components)
+    ]
+    connected = asyncio.Semaphore(0)
+    component_tasks = [
+        asyncio.create_task(component.run(f'ws://127.0.0.1:{td_port}', connected))
+        for component in components
+    ]
+    for _ in components:
+        await connected.acquire()
+    await asyncio.sleep(0.5)  # Let the initial state updates settle
+
+    # Spread outputs across browsers so each (component, block) has one driver
+    all_targets = [(c.component_id, b) for c in components for b in range(args.outputs)]
+    browser_targets = [all_targets[i::args.browsers] or all_targets for i in range(args.browsers)]
+
+    sources = components[0].sources if components else []
+    url = f'ws://127.0.0.1:{browser_port}'
+    workers = psutil.Process().children() if psutil else []  # Started before any client process
+    pool = None
+    if args.client_processes > 1:
+        # Browsers in their own processes, so the clients don't cap what the workers can serve
+        pool = concurrent.futures.ProcessPoolExecutor(args.client_processes, mp_context=multiprocessing.get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, time.sleep, 0.2) for _ in range(args.client_processes)))
+
+    traffic.messages = traffic.bytes = 0
+    cpu_start = bridge.cpu_time()
+    worker_cpu_start = worker_cpu_time(workers)
+    if pool:
+        groups = [
+            [(i, browser_targets[i]) for i in range(first, args.browsers, args.client_processes)]
+            for first in range(args.client_processes)
+        ]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, run_browser_group, group, sources, not args.full_state, args.interval, args.duration, url)
+            for group in groups
+        ))
+        pool.shutdown()
+    else:
+        results = [await run_browsers(
+            list(enumerate(browser_targets)), sources, not args.full_state, args.interval, args.duration, url
+        )]
+    wall = max(result['wall'] for result in results)
+    cpu = bridge.cpu_time() - cpu_start
+    worker_cpu = worker_cpu_time(workers) - worker_cpu_start
+    stats = bridge.call(start_server.bridge_stats)
+
+    for task in component_tasks:
+        task.cancel()
+    await asyncio.gather(*component_tasks, return_exceptions=True)
+
+    return {
+        'wall': wall,
+        'cpu': cpu,
+        'worker_cpu': worker_cpu,
+        'latencies': [lat for result in results for lat in result['latencies']],
+        'timeouts': sum(result['timeouts'] for result in results),
+        'messages': traffic.messages + sum(result['messages'] for result in results),
+        'bytes': traffic.bytes + sum(result['bytes'] for result in results),
+        'stats': stats,
+    }
+
+def report(args, result):
+    latencies_ms = [lat * 1000 for lat in result['latencies']]
+    wall = result['wall']
+    print('=' * 60)
+    print('NDI Named Router bridge benchmark')
+    print('=' * 60)
+    print(f"Components: {args.components} x {args.outputs} outputs, {args.sources} sources each")
+    print(f"Browsers:   {args.browsers} ({'full state_update' if args.full_state else 'state_patch'})")
+    print(f"Coalescing: {start_server.bridge_config['coalesce_ms']:g} ms")
+    print(f"Workers:    {args.workers or 'off (browsers served by the bridge thread)'}")
+    print(f"TD wire:    {'msgpack' if args.msgpack else 'json'}")
+    print(f"Duration:   {wall:.1f} s")
+    print()
+    print(f"set_source -> source_changed: {len(latencies_ms)} samples, {result['timeouts']} timeouts")
+    if latencies_ms:
+        print(f"  p50: {percentile(latencies_ms, 50):8.2f} ms")
+        print(f"  p99: {percentile(latencies_ms, 99):8.2f} ms")
+        print(f"  max: {max(latencies_ms):8.2f} ms")
+        print(f"  mean: {statistics.mean(latencies_ms):7.2f} ms")
+        print(f"  commands/s: {len(latencies_ms) / wall:.1f}")
+    print()
+    print(f"Client receive: {result['messages'] / wall:10.1f} msg/s {result['bytes'] / wall / 1024:10.1f} KiB/s")
+    print(f"Dropped frames: {result['stats']['dropped_frames']}, evicted clients: {result['stats']['evicted_clients']}")
+    print(f"Bridge CPU:     {result['cpu'] / wall * 100:6.1f} % of one core")
+    if args.workers and psutil:
+        print(f"Worker CPU:     {result['worker_cpu'] / wall * 100:6.1f} % of one core (all {args.workers} workers)")
+    if psutil:
+        print(f"Process RSS:    {psutil.Process().memory_info().rss / 1024 ** 2:6.1f} MiB")
+    elif resource:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            max_rss //= 1024  # bytes on macOS, KiB elsewhere
+        print(f"Process RSS:    peak {max_rss / 1024:.1f} MiB")
+    else:
+        print("Process RSS:    unavailable (install psutil)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--components', type=int, default=4, help='Simulated TD components (default: 4)')
+    parser.add_argument('-m', '--outputs', type=int, default=16, help='Outputs per component (default: 16)')
+    parser.add_argument('-s', '--sources', type=int, default=200, help='NDI sources per component (default: 200)')
+    parser.add_argument('-k', '--browsers', type=int, default=10, help='Simulated browsers (default: 10)')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Measurement time in seconds (default: 10)')
+    parser.add_argument('--interval', type=float, default=0.05, help='Pause between commands per browser in seconds (default: 0.05)')
+    parser.add_argument('--full-state', action='store_true', help='Browsers receive full state_update instead of state_patch')
+    parser.add_argument('--coalesce-ms', type=float, default=start_server.bridge_config['coalesce_ms'], help='Bridge coalescing window')
+    parser.add_argument('--msgpack', action='store_true', help='Simulated components negotiate MessagePack')
+    parser.add_argument('--workers', type=int, default=0, help='Bridge worker processes serving the browsers (default: 0, off)')
+    parser.add_argument('--client-processes', type=int, default=1, help='Processes running the simulated browsers (default: 1, in-process)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    parser.add_argument('--verbose', action='store_true', help='Show the bridge log output')
+    args = parser.parse_args()
+    if args.msgpack and not (msgpack and 'msgpack' in start_server.WIRE_ENCODINGS):
+        parser.error('--msgpack needs the msgpack package (pip install msgpack)')
+
+    start_server.bridge_config['coalesce_ms'] = args.coalesce_ms
+    start_server.bridge_config['workers'] = args.workers
+    browser_port, td_port = free_port(), free_port()
+
+    # The bridge logs every message; keep that out of the report unless asked for
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with log:
+        bridge = BridgeThread(browser_port, td_port)
+        bridge.start()
+        time.sleep(0.3 + 1.5 * bool(args.workers))  # Worker processes take a moment to start
+        result = asyncio.run(run_clients(args, browser_port, td_port, bridge))
+        time.sleep(0.2)  # Let the bridge log the disconnects
+    report(args, result)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark the incremental MergedState against the full merge rebuild
+Replays a stream of component state updates (resolution tweaks, lock toggles,
+source changes, sources appearing/disappearing, reconnects) and checks that
+both produce identical merged states before timing them.
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from start_server import MergedState, rebuild_merged_state
+
+def make_state(component_id, num_outputs, sources):
+    """Build a state dict shaped like NDINamedRouterExt.getCurrentState()"""
+    return {
+        'component_id': component_id,
+        'component_name': component_id,
+        'machine_id': f'host-{component_id}',
+        'sources': list(sources),
+        'local_only_sources': [],
+        'output_names': [f'{component_id} Out {i}' for i in range(num_outputs)],
+        'current_sources': [sources[i % len(sources)] for i in range(num_outputs)],
+        'regex_patterns': [f'.*_Out{i}' for i in range(num_outputs)],
+        'effective_regex_patterns': [f'.*_Out{i}s?\\)?' for i in range(num_outputs)],
+        'plural_handling_enabled': True,
+        'output_resolutions': [[1920, 1080]] * num_outputs,
+        'lock_global': False,
+        'locks': [False] * num_outputs,
+        'last_update': time.time()
+    }
+
+def make_updates(rng, states, all_sources, count):
+    """Generate a reproducible stream of (op, component_id, state) tuples"""
+    updates = []
+    current = copy.deepcopy(states)
+    for _ in range(count):
+        component_id = rng.choice(list(current))
+        state = copy.deepcopy(current[component_id])
+        roll = rng.random()
+        idx = rng.randrange(len(state['output_names']))
+        if roll < 0.35:
+            state['output_resolutions'][idx] = [rng.choice([1280, 1920, 3840]), rng.choice([720, 1080, 2160])]
+        elif roll < 0.6:
+            state['locks'][idx] = not state['locks'][idx]
+        elif roll < 0.8:
+            state['current_sources'][idx] = rng.choice(all_sources)
+        elif roll < 0.88:
+            state['sources'].append(f'NEW ({rng.randrange(10**6)})')
+        elif roll < 0.94:
+            if len(state['sources']) > 1:
+                state['sources'].pop(rng.randrange(len(state['sources'])))
+        elif roll < 0.97:
+            state['lock_global'] = not state['lock_global']
+        else:
+            # Reconnect: the component drops out and comes back at the end
+            updates.append(('remove', component_id, None))
+            del current[component_id]
+        current[component_id] = state
+        updates.append(('update', component_id, state))
+    return updates
+
+def check(ok, message):
+    """Fail the run, also under python -O where assert is skipped"""
+    if not ok:
+        sys.exit(f'FAILED: {message}')
+
+def strip_timestamp(merged):
+    merged = dict(merged)
+    merged.pop('last_update', None)
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--components', type=int, default=14, help='Number of TD components (default: 14)')
+    parser.add_argument('--outputs', type=int, default=16, help='Outputs per component (default: 16)')
+    parser.add_argument('--sources', type=int, default=600, help='NDI sources on the network (default: 600)')
+    parser.add_argument('--updates', type=int, default=500, help='Number of state updates to replay (default: 500)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    all_sources = [f'HOST{i // 4} (Source_{i})' for i in range(args.sources)]
+    states = {}
+    for c in range(args.components):
+        component_id = f'Component_{c}'
+        # Every component sees most of the network, in its own discovery order
+        visible = rng.sample(all_sources, int(len(all_sources) * 0.9))
+        states[component_id] = make_state(component_id, args.outputs, visible)
+    updates = make_updates(rng, states, all_sources, args.updates)
+
+    # Equivalence check
+    reference_states = {}
+    engine = MergedState()
+    for cid, state in states.items():
+        reference_states[cid] = state
+        engine.update_component(cid, state)
+    check(strip_timestamp(engine.snapshot()) == strip_timestamp(rebuild_merged_state(reference_states)), 'Merged state mismatch after the initial components')
+    for op, cid, state in updates:
+        if op == 'remove':
+            del reference_states[cid]
+            engine.remove_component(cid)
+        else:
+            reference_states[cid] = state
+            engine.update_component(cid, state)
+        expected = strip_timestamp(rebuild_merged_state(reference_states))
+        actual = strip_timestamp(engine.snapshot())
+        check(actual == expected, f'Merged state mismatch after {op} of {cid}')
+    print(f'Equivalence: OK ({len(updates)} updates)')
+
+    # Full rebuild on every update (previous bridge behaviour)
+    reference_states = dict(states)
+    start = time.perf_counter()
+    for op, cid, state in updates:
+        if op == 'remove':
+            del reference_states[cid]
+        else:
+            reference_states[cid] = state
+        rebuild_merged_state(reference_states)
+    full_time = time.perf_counter() - start
+
+    # Incremental engine
+    engine = MergedState(dict(states))
+    start = time.perf_counter()
+    for op, cid, state in updates:
+        if op == 'remove':
+            engine.remove_component(cid)
+        else:
+            engine.update_component(cid, state)
+        engine.snapshot()
+    incremental_time = time.perf_counter() - start
+
+    print(f'Components: {args.components}, outputs/component: {args.outputs}, sources: {args.sources}')
+    print(f'Full rebuild:  {full_time * 1000 / len(updates):8.3f} ms/update')
+    print(f'Incremental:   {incremental_time * 1000 / len(updates):8.3f} ms/update')
+    print(f'Speedup:       {full_time / incremental_time:8.1f}x')
+
+if __name__ == '__main__':
+    main()
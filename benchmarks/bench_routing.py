@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark the headless SourceRouter against the previous per-block routing loop
+Checks on random setups (locks, manual picks, Spout sources, plural handling,
+{} quantifiers, character escapes, invalid patterns) that both make the same assignments, and that a burst of new
+sources routed in one pass matches routing them one by one, then times a full remap
+a newly appeared source and a burst of new sources (one pass vs. one routing per
+source) at 10k sources x 256 outputs by default.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'NDI_NamedRouter'))
+
+from SourceRouting import Block, SourceRegistry, SourceRouter, transformPatternForPlurals
+
+def reference_route(sources, blocks, latest_source=None, plural_handling=True):
+    """updateSourceMapping as it was before SourceRouter: every block tries its own regex
+
+    Like that code it raises re.error on the first invalid pattern it has to match.
+    """
+    assignments = [block.current for block in blocks]
+    matched = []
+    for block_idx, block in enumerate(blocks):
+        if block.locked:
+            continue
+        if not latest_source and block.current in sources:
+            matched.append(block_idx)
+            continue
+        pattern = transformPatternForPlurals(block.pattern, plural_handling)
+        if latest_source:
+            name = latest_source[6:] if latest_source.startswith('SPOUT:') else latest_source
+            if re.fullmatch(pattern, name, re.IGNORECASE):
+                assignments[block_idx] = latest_source
+                matched.append(block_idx)
+                continue
+        current = block.current
+        if current:
+            name = current[6:] if current.startswith('SPOUT:') else current
+            if re.fullmatch(pattern, name, re.IGNORECASE):
+                matched.append(block_idx)
+                continue
+        if latest_source:
+            continue
+        for source in sources:
+            name = source[6:] if source.startswith('SPOUT:') else source
+            if re.fullmatch(pattern, name, re.IGNORECASE):
+                assignments[block_idx] = source
+                matched.append(block_idx)
+                break
+    return assignments, matched
+
+def check(ok, message):
+    """Fail the run, also under python -O where assert is skipped"""
+    if not ok:
+        sys.exit(f'FAILED: {message}')
+
+def make_sources(rng, count):
+    """NDI-style 'HOST (Name)' sources plus a few Spout senders"""
+    kinds = ['Camera', 'Projector', 'Screen', 'Resolume', 'OBS', 'Capture']
+    sources = []
+    for i in range(count):
+        name = f'{rng.choice(kinds)}{i % 97}'
+        if rng.random() < 0.05:
+            sources.append(f'SPOUT:{name}')
+        else:
+            sources.append(f'HOST{i % 40} ({name})')
+    return sources
+
+def make_patterns(rng, count, invalid=True):
+    """A mix of the pattern shapes people type into Sourceregex"""
+    patterns = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.35:
+            patterns.append(f'.*Camera{i % 97}')
+        elif roll < 0.55:
+            patterns.append(f'HOST{i % 40} \\(Projector.*')
+        elif roll < 0.7:
+            patterns.append(f'.*(screen|capture){i % 97}')
+        elif roll < 0.75:
+            patterns.append('.*resolume[0-9]+')
+        elif roll < 0.8:
+            # {} quantifiers, whose digits are not literals the name has to contain
+            patterns.append(rng.choice(['.*\\([a-z]{6}\\d{1,2}', f'HOST\\d{{1,2}} \\(Screen{i % 97}', '.*[A-Z]{3}[0-9]{2}']))
+        elif roll < 0.85:
+            # Octal, hex and named character escapes
+            patterns.append(rng.choice([f'.*\\x43amera{i % 97}', '\\110OST\\d+ \\(\\103apture.*', '\\N{LATIN CAPITAL LETTER H}OST1\\d .*']))
+        elif roll < 0.9:
+            patterns.append(f'.*Missing{i}')
+        elif roll < 0.95:
+            patterns.append('')
+        else:
+            patterns.append('.*(broken' if invalid else '.*')
+    return patterns
+
+def compiles(pattern, plural_handling):
+    try:
+        re.compile(transformPatternForPlurals(pattern, plural_handling))
+        return True
+    except re.error:
+        return False
+
+def make_blocks(rng, patterns, sources):
+    blocks = []
+    for pattern in patterns:
+        roll = rng.random()
+        if roll < 0.3:
+            current = rng.choice(sources)
+        elif roll < 0.5:
+            current = f'GONE ({rng.choice(sources)})'
+        else:
+            current = ''
+        blocks.append(Block(pattern, current, rng.random() < 0.1))
+    return blocks
+
+def check_equivalence(rng, trials):
+    for trial in range(trials):
+        sources = make_sources(rng, rng.randint(0, 60))
+        patterns = make_patterns(rng, rng.randint(1, 24))
+        blocks = make_blocks(rng, patterns, sources or ['NONE (x)'])
+        plural_handling = rng.random() < 0.8
+        latest = rng.choice(sources) if sources and rng.random() < 0.5 else None
+        router = SourceRouter(enablePluralHandling=plural_handling)
+        result = router.routeNew(blocks, [latest]) if latest else router.route(sources, blocks)
+
+        # The previous code raised on an invalid pattern, the router skips such blocks instead:
+        # compare against the previous code with those blocks locked, which it did skip
+        invalid = {i for i, block in enumerate(blocks) if not compiles(block.pattern, plural_handling)}
+        reference_blocks = [block._replace(locked=True) if i in invalid else block for i, block in enumerate(blocks)]
+        expected, expected_matched = reference_route(sources, reference_blocks, latest, plural_handling)
+        check(result.assignments == expected, f'Assignment mismatch in trial {trial}')
+        check([i for i in result.matched if i not in invalid] == sorted(expected_matched), f'Matched blocks mismatch in trial {trial}')
+        check(result.changed == [i for i, block in enumerate(blocks) if expected[i] != block.current], f'Changed blocks mismatch in trial {trial}')
+
+        # The registry the extension passes in routes like the plain list it iterates as
+        registry = SourceRegistry()
+        registry.setNdi(source for source in sources if not source.startswith('SPOUT:'))
+        registry.setSpout(source[6:] for source in sources if source.startswith('SPOUT:'))
+        check(router.route(registry, blocks) == router.route(list(registry), blocks), f'Registry mismatch in trial {trial}')
+
+        # A burst of new sources routed in one pass ends up where routing them one by one would
+        if sources:
+            burst = rng.sample(sources, min(len(sources), rng.randint(1, 8)))
+            sequential, sequential_matched = reference_blocks, set()
+            for source in burst:
+                assignments, step_matched = reference_route(sources, sequential, source, plural_handling)
+                sequential = [block._replace(current=current) for block, current in zip(sequential, assignments)]
+                sequential_matched.update(step_matched)
+            result = router.routeNew(blocks, burst)
+            check(result.assignments == [block.current for block in sequential], f'Burst mismatch in trial {trial}')
+            check([i for i in result.matched if i not in invalid] == sorted(sequential_matched), f'Burst matched blocks mismatch in trial {trial}')
+    return trials
+
+def time_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=10000, help='Sources on the network (default: 10000)')
+    parser.add_argument('--outputs', type=int, default=256, help='Switch blocks (default: 256)')
+    parser.add_argument('--trials', type=int, default=2000, help='Random setups for the equivalence check (default: 2000)')
+    parser.add_argument('--burst', type=int, default=200, help='Sources appearing in one frame (default: 200)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (default: 3)')
+    parser.add_argument('--check-only', action='store_true', help='Only run the equivalence check, e.g. after changing SourceRouting.py')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'Equivalence: OK ({check_equivalence(rng, args.trials)} setups)')
+    if args.check_only:
+        return
+
+    sources = make_sources(rng, args.sources)
+    patterns = make_patterns(rng, args.outputs, invalid=False)
+    # Nothing routed yet: every block has to search the sources
+    blocks = [Block(pattern, '', False) for pattern in patterns]
+    latest = sources[len(sources) // 2]
+    burst = rng.sample(sources, min(args.burst, len(sources)))
+    router = SourceRouter()
+    router.route(sources, blocks)  # Compile patterns outside the timings
+
+    result = router.route(sources, blocks)
+    expected, _ = reference_route(sources, blocks)
+    check(result.assignments == expected, 'Assignment mismatch at full size')
+
+    reference_full = time_call(lambda: reference_route(sources, blocks), args.repeat)
+    router_full = time_call(lambda: router.route(sources, blocks), args.repeat)
+    reference_latest = time_call(lambda: reference_route(sources, blocks, latest), args.repeat)
+    router_latest = time_call(lambda: router.routeNew(blocks, [latest]), args.repeat)
+    reference_burst = time_call(lambda: [reference_route(sources, blocks, source) for source in burst], args.repeat)
+    router_burst = time_call(lambda: router.routeNew(blocks, burst), args.repeat)
+
+    print(f'Sources: {args.sources}, outputs: {args.outputs}, routed blocks: {len(result.matched)}')
+    print(f'Full remap     previous: {reference_full * 1000:9.2f} ms   SourceRouter: {router_full * 1000:9.2f} ms   ({reference_full / router_full:.1f}x)')
+    print(f'Latest source  previous: {reference_latest * 1000:9.2f} ms   SourceRouter: {router_latest * 1000:9.2f} ms   ({reference_latest / router_latest:.1f}x)')
+    print(f'Burst of {len(burst):<5} previous: {reference_burst * 1000:9.2f} ms   SourceRouter: {router_burst * 1000:9.2f} ms   ({reference_burst / router_burst:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,37 @@ Author : Dan@DAN-4090
 Saveorigin : NDI_NamedRouter.76.toe
 Saveversion : 2023.12120
 Info Header End'''
-import re
 import json
 import time
 from TDStoreTools import StorageManager
 
+try:
+	import msgpack  # Optional: binary wire format to the bridge
+except ImportError:
+	msgpack = None
+
 CustomParHelper: CustomParHelper = next(d for d in me.docked if 'ExtUtils' in d.tags).mod('CustomParHelper').CustomParHelper # import
 ####
 
+def _loadSourceRouting():
+	"""SourceRouting.py from disk, for components saved before they had the SourceRouting DAT"""
+	import importlib.util
+	import os
+	folder = os.path.dirname(me.par.file.eval()) or os.path.join('scripts', 'NDI_NamedRouter')
+	path = os.path.join(project.folder, folder, 'SourceRouting.py')  # join() keeps an absolute folder as is
+	if not os.path.isfile(path):
+		raise ImportError(f'SourceRouting not found: add a Text DAT named SourceRouting synced to {path}')
+	spec = importlib.util.spec_from_file_location('SourceRouting', path)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+try:
+	from SourceRouting import Block, SourceRegistry, SourceRouter  # Text DAT next to this extension, synced to SourceRouting.py
+except ImportError:
+	_sourceRouting = _loadSourceRouting()
+	Block, SourceRegistry, SourceRouter = _sourceRouting.Block, _sourceRouting.SourceRegistry, _sourceRouting.SourceRouter
+
 def debug(message):
 	if parent.NDINamedRouter.par.Debugmessages.eval():
 		tdu.debug.debug(message)
@@ -29,12 +52,22 @@ class NDINamedRouterExt:
 		import socket
 		self.machineId = socket.gethostname()
 		
-		# Plural handling configuration
-		self.enablePluralHandling = True
+		# Auto-routing rules, with plural handling enabled
+		self.router = SourceRouter(enablePluralHandling=True, log=debug)
+		
+		# NDI sources and Spout sources (local only), with the combined list the menus show
+		self.sourceRegistry = SourceRegistry()
+		self._menuVersion = None  # sourceRegistry.version last pushed to the menus
+		self._syncNdiSources()
+		
+		# (block_idx, par name) -> value set by a set_sources batch, whose per-block callbacks stay quiet;
+		# cleared by the end-of-frame acknowledgement of the batch
+		self._batchedChanges = {}
 		
-		# Store Spout sources (local only, no regex auto-switching)
-		self.spoutSources = []
-		self.previousSpoutSources = []  # Track previous sources to detect new ones
+		# Sources reported appeared/disappeared this frame (dicts as ordered sets), routed together at frame end
+		self._appearedBatch = {}
+		self._disappearedBatch = {}
+		self._sourceBatchScheduled = False
 		
 		# Initialize Spout sources list from DAT
 		self.onSpoutSourcesChanged()
@@ -43,8 +76,7 @@ class NDINamedRouterExt:
 		self.webHandler = WebHandler(self)
 
 		
-		self.seqSwitch[0].par.Currentsource.menuLabels = self.sources
-		self.seqSwitch[0].par.Currentsource.menuNames = self.sources
+		self._pushSourceMenus()
 
 		debug(f'NDI Named Switcher Extension initialized with {len(self.sources)} sources')
 		debug(f'Plural handling: {"enabled" if self.enablePluralHandling else "disabled"}')
@@ -69,27 +101,17 @@ class NDINamedRouterExt:
 
 
 
-	def transformPatternForPlurals(self, pattern):
-		"""Transform a regex pattern to handle both singular and plural forms
-		
-		This method adds 's?' to word endings when plural handling is enabled.
-		It's designed to be conservative and only modify simple word patterns.
-		The closing parenthesis is optional to support both NDI (with parentheses) and Spout (without).
-		"""
-		if not self.enablePluralHandling:
-			return pattern + r'\)?'  # Optional closing parenthesis
-		
-		# Only apply to simple patterns that end with word characters
-		# This avoids breaking complex regex patterns
-		if re.match(r'^[a-zA-Z0-9_.*]+$', pattern):
-			# Look for word endings and add s? if they don't already have it
-			# This handles patterns like 'projector' -> 'projectors?'
-			# But leaves patterns like 'projector.*' or 'projectors?' unchanged
-			if re.search(r'[a-zA-Z0-9_]$', pattern) and not pattern.endswith('s?'):
-				transformed = pattern + r's?\)?'  # Optional closing parenthesis
-				return transformed
-		
-		return pattern + r'\)?'  # Optional closing parenthesis
+	@property
+	def enablePluralHandling(self):
+		return self.router.enablePluralHandling
+
+	@enablePluralHandling.setter
+	def enablePluralHandling(self, value):
+		self.router.enablePluralHandling = value
+
+	def patternEntry(self, pattern):
+		"""Effective pattern, compiled case-insensitive regex and error for a block's Sourceregex"""
+		return self.router.patternEntry(pattern)
 
 	@property#
 	def seqSwitch(self):
@@ -105,10 +127,12 @@ class NDINamedRouterExt:
 	@property
 	def effectiveRegexPatterns(self):
 		"""Get the actual patterns used for matching (after plural transformation)"""
-		patterns = []
-		for pattern in self.regexPatterns:
-			patterns.append(self.transformPatternForPlurals(pattern))
-		return patterns
+		return [self.patternEntry(pattern)[0] for pattern in self.regexPatterns]
+
+	@property
+	def regexErrors(self):
+		"""Per block: why its Sourceregex doesn't compile, or None"""
+		return [self.patternEntry(pattern)[2] for pattern in self.regexPatterns]
 
 	@property
 	def outputNames(self):
@@ -119,10 +143,30 @@ class NDINamedRouterExt:
 
 	@property
 	def sources(self):
-		# Merge NDI sources with prefixed Spout sources
-		ndi_sources = [_cell.val for _cell in self.ndiTable.col('sourceName')[1:]]
-		spout_sources = [f'SPOUT:{name}' for name in self.spoutSources]
-		return ndi_sources + spout_sources
+		# NDI sources followed by prefixed Spout sources (cached, don't modify)
+		return self.sourceRegistry.combined
+
+	@property
+	def spoutSources(self):
+		return self.sourceRegistry.spout
+
+	def _syncNdiSources(self):
+		"""Read ndi_watcher into the registry, returns (appeared, disappeared)"""
+		return self.sourceRegistry.setNdi(_cell.val for _cell in self.ndiTable.col('sourceName')[1:])
+
+	def _pushSourceMenus(self):
+		"""Set every block's Currentsource menu to the registry's sources, if they changed"""
+		if self._menuVersion == self.sourceRegistry.version:
+			return
+		self._menuVersion = self.sourceRegistry.version
+		# Save current sources before updating menus (prevents TouchDesigner from changing them)
+		saved_sources = self.currentSources
+		combined_sources = self.sourceRegistry.combined
+		for block in self.seqSwitch:
+			block.par.Currentsource.menuLabels = combined_sources
+			block.par.Currentsource.menuNames = combined_sources
+		# Restore current sources after menu update
+		self.currentSources = saved_sources
 	
 	@property
 	def currentSources(self):
@@ -158,7 +202,7 @@ class NDINamedRouterExt:
 	def _recallSavedSources(self):
 		savedSources = self.stored['savedSources']
 		for _block, _source in zip(self.seqSwitch, savedSources):
-			if _source['source'] in self.seqSwitch[0].par.Currentsource.menuNames:
+			if _source['source'] in self.sourceRegistry:
 				_block.par.Currentsource.val = _source['source']
 				_block.par.Showplaceholder.val = _source['showPlaceholder']
 			else:
@@ -192,7 +236,7 @@ class NDINamedRouterExt:
 		"""Get current state for WebSocket communication"""
 		try:
 			# Mark Spout sources as local-only (not available to remote clients)
-			local_only_sources = [f'SPOUT:{name}' for name in self.spoutSources]
+			local_only_sources = self.sourceRegistry.localOnly
 			
 			state = {
 				'component_id': self.componentId,
@@ -204,10 +248,12 @@ class NDINamedRouterExt:
 				'current_sources': [block.par.Currentsource.val for block in self.seqSwitch],
 				'regex_patterns': self.regexPatterns,
 				'effective_regex_patterns': self.effectiveRegexPatterns,
+				'regex_errors': self.regexErrors,
 				'plural_handling_enabled': self.enablePluralHandling,
 				'output_resolutions': self.outputResolutions,
 				'lock_global': self.ownerComp.par.Lockglobal.eval(),
 				'locks': [block.par.Lock.eval() for block in self.seqSwitch],
+				'placeholders': [block.par.Showplaceholder.eval() for block in self.seqSwitch],
 				'last_update': time.time()
 			}
 			return state
@@ -235,6 +281,43 @@ class NDINamedRouterExt:
 			debug(f'Error setting source: {e}')
 			return False
 
+	def handleSetSources(self, routes):
+		"""Handle a batch of source selections from web interface in one pass
+		
+		Routes may also carry 'locked' and 'placeholder' (scene recall). Returns
+		(applied, failed) route lists. The caller sends a single sources_changed
+		and state_update for the batch instead of one per block, at frame end,
+		then calls endSetSources().
+		"""
+		applied = []
+		failed = []
+		numBlocks = len(self.seqSwitch)
+		for route in routes:
+			block_idx = route.get('block_idx')
+			source_name = route.get('source_name')
+			if isinstance(block_idx, int) and 0 <= block_idx < numBlocks and isinstance(source_name, str):
+				_block = self.seqSwitch[block_idx]
+				self._setBatched(_block, block_idx, 'Currentsource', source_name)
+				if 'locked' in route:
+					self._setBatched(_block, block_idx, 'Lock', bool(route['locked']))
+				if 'placeholder' in route:
+					_block.par.Showplaceholder.val = bool(route['placeholder'])
+				applied.append(route)
+			else:
+				failed.append(route)
+		debug(f'Set sources batch: {len(applied)} applied, {len(failed)} failed')
+		return applied, failed
+
+	def endSetSources(self):
+		"""The batch is acknowledged and its parameter callbacks have run: later changes are announced again"""
+		self._batchedChanges.clear()
+
+	def _setBatched(self, block, block_idx, parName, value):
+		par = getattr(block.par, parName)
+		if par.eval() != value:
+			self._batchedChanges[(block_idx, parName)] = value
+			par.val = value
+
 	def handleRefreshSources(self):
 		"""Handle refresh sources request from web interface"""
 		try:
@@ -267,6 +350,8 @@ class NDINamedRouterExt:
 
 	def onSeqSwitchNSourceregex(self, idx, val):
 		debug(f'onSeqSwitchNSourceregex: {idx} {val}')
+		# Drop compiled patterns nobody uses anymore
+		self.router.clear()
 		return
 
 	def onSeqSwitchNCurrentsource(self, idx, val):
@@ -295,7 +380,10 @@ class NDINamedRouterExt:
 		
 		# Notify web clients of source change
 		debug(f'Source changed for block {idx}: {val}')
-		if hasattr(self, 'webHandler'):
+		if self._batchedChanges.get((idx, 'Currentsource')) == val:
+			# Already announced by the sources_changed of a set_sources batch
+			del self._batchedChanges[(idx, 'Currentsource')]
+		elif hasattr(self, 'webHandler'):
 			self.webHandler.broadcastSourceChange(idx, val)
 
 	def onSeqSwitchNResx(self, idx, val):
@@ -315,8 +403,11 @@ class NDINamedRouterExt:
 	def onSeqSwitchNLock(self, idx, val):
 		"""Called when individual block lock parameter changes"""
 		debug(f'Lock for block {idx} changed to: {val}')
-		# Broadcast state update to web interface
-		if hasattr(self, 'webHandler'):
+		if self._batchedChanges.get((idx, 'Lock')) == bool(val):
+			# Part of a set_sources batch, which sends one state update at the end
+			del self._batchedChanges[(idx, 'Lock')]
+		elif hasattr(self, 'webHandler'):
+			# Broadcast state update to web interface
 			self.webHandler.broadcastStateUpdate()
 
 	def updateSourceMapping(self, latestSourceName=None):
@@ -325,153 +416,101 @@ class NDINamedRouterExt:
 		Note: All regex matching and source name comparisons are case-insensitive
 		Respects lock states - locked outputs won't be automatically updated
 		"""
+		if latestSourceName:
+			return self.routeSources(newSources=[latestSourceName])
+		return self.routeSources(remap=True)
+
+	def routeSources(self, newSources=(), remap=False):
+		"""Route blocks to sources that appeared and, with remap, away from sources that are gone
+		
+		The rules live in SourceRouter; this reads the blocks, writes back what moved and
+		broadcasts the state once. Returns the indices of the blocks whose source changed.
+		"""
+		changed = []
 		# Check global lock - if enabled, skip all auto-routing
 		if self.ownerComp.par.Lockglobal.eval():
 			debug('Global lock enabled - skipping auto-routing')
-			return
-		
-		sources = self.sources
-		if not isinstance(sources, list):
-			sources = [sources]
-		
-		matched_idxs = []
-		
-		if latestSourceName:
-			# When latestSourceName is provided: Only update blocks whose regex patterns match this latest source
-			debug(f'Updating only blocks that match latest source: {latestSourceName}')
-			
-			# Get matchable name (strip SPOUT: prefix for pattern matching)
-			matchableName = latestSourceName[6:] if latestSourceName.startswith('SPOUT:') else latestSourceName
-			debug(f'Matchable name: {matchableName}')
-			for blockIdx, pattern in enumerate(self.regexPatterns):
-				# Check if this specific block is locked
-				if self.seqSwitch[blockIdx].par.Lock.eval():
-					debug(f'Block {blockIdx} is locked - skipping auto-routing')
-					continue
-				
-				# Apply plural handling transformation if enabled
-				transformedPattern = self.transformPatternForPlurals(pattern)
-				
-				debug(f'Checking block {blockIdx} with pattern {transformedPattern} for latest source {latestSourceName}')
-				# Check if the latest source matches this block's pattern (use matchable name without prefix)
-				if re.fullmatch(transformedPattern, matchableName, re.IGNORECASE):
-					debug(f'Latest source {latestSourceName} matches pattern {blockIdx}: {transformedPattern}')
-					
-					# Use the full source name directly
-					self.seqSwitch[blockIdx].par.Currentsource.val = latestSourceName
-					matched_idxs.append(blockIdx)
-					debug(f'Updated block {blockIdx} to use latest source: {latestSourceName}')
-				else:
-					# Check if current source is still valid for this block (don't change it)
-					currentSource = self.seqSwitch[blockIdx].par.Currentsource.val
-					if currentSource:
-						# Strip SPOUT: prefix for pattern matching
-						currentMatchable = currentSource[6:] if currentSource.startswith('SPOUT:') else currentSource
-						if re.fullmatch(transformedPattern, currentMatchable, re.IGNORECASE):
-							matched_idxs.append(blockIdx)
-							debug(f'Block {blockIdx} keeping current source: {currentSource}')
 		else:
-			# When not using latest source: For each block, if current output matches regex, keep it. Otherwise find a matching one.
-			debug('Updating all blocks based on current state')
-			for blockIdx, pattern in enumerate(self.regexPatterns):
-				# Check if this specific block is locked
-				if self.seqSwitch[blockIdx].par.Lock.eval():
-					debug(f'Block {blockIdx} is locked - skipping auto-routing')
-					continue
-				
-				# this is to prevent overriding a manual source change
-				if self.seqSwitch[blockIdx].par.Currentsource.eval() in sources:
-					debug(f'current source is already in prev sources, nothing to do really')
-					matched_idxs.append(blockIdx)
-					continue
-
-				# Apply plural handling transformation if enabled
-				transformedPattern = self.transformPatternForPlurals(pattern)
-				debug(f'Checking block {blockIdx} with pattern: {pattern} -> {transformedPattern}')
-				
-				# First check if current source still matches the pattern
-				currentSource = self.seqSwitch[blockIdx].par.Currentsource.val
-				currentStillMatches = False
-				
-				if currentSource:
-					# Strip SPOUT: prefix for pattern matching
-					currentMatchable = currentSource[6:] if currentSource.startswith('SPOUT:') else currentSource
-					if re.fullmatch(transformedPattern, currentMatchable, re.IGNORECASE):
-						# Current source still matches, keep it
-						currentStillMatches = True
-						matched_idxs.append(blockIdx)
-						debug(f'Block {blockIdx} keeping current source: {currentSource} (still matches pattern)')
-				
-				# If current source doesn't match, find a new matching source
-				if not currentStillMatches:
-					matchingSource = None
-					
-					# Find first source that matches this pattern
-					for source in sources:
-						# Strip SPOUT: prefix for pattern matching
-						sourceMatchable = source[6:] if source.startswith('SPOUT:') else source
-						if re.fullmatch(transformedPattern, sourceMatchable, re.IGNORECASE):
-							matchingSource = source
-							debug(f'Source {source} matches pattern {transformedPattern} (case-insensitive)')
-							break
-					
-					# Use the matching source if found
-					if matchingSource:
-						self.seqSwitch[blockIdx].par.Currentsource.val = matchingSource
-						matched_idxs.append(blockIdx)
-						debug(f'Updated block {blockIdx} to new matching source: {matchingSource}')
-					else:
-						debug(f'No sources match pattern {blockIdx}: {transformedPattern}')
-		
-		debug(f"Updated source mapping {self.seqSwitch}")
-		if latestSourceName is not None and matched_idxs:
-			for _idx in matched_idxs:
+			before = [
+				Block(_block.par.Sourceregex.eval(), _block.par.Currentsource.eval(), _block.par.Lock.eval())
+				for _block in self.seqSwitch
+			]
+			blocks = before
+			matched = []
+			if newSources:
+				result = self.router.routeNew(blocks, newSources)
+				matched = result.matched
+				blocks = [block._replace(current=source) for block, source in zip(blocks, result.assignments)]
+			if remap:
+				blocks = [
+					block._replace(current=source)
+					for block, source in zip(blocks, self.router.route(self.sourceRegistry, blocks).assignments)
+				]
+			
+			for blockIdx, (old, new) in enumerate(zip(before, blocks)):
+				if new.current != old.current:
+					self.seqSwitch[blockIdx].par.Currentsource.val = new.current
+					changed.append(blockIdx)
+			
+			debug(f"Updated source mapping {self.seqSwitch}, changed blocks: {changed}")
+			# Blocks showing a new source (or keeping a matching one) drop their placeholder
+			for _idx in matched:
 				self.seqSwitch[_idx].par.Showplaceholder.val = False
 		
 		# Notify web clients of state changes
 		if hasattr(self, 'webHandler'):
 			self.webHandler.broadcastStateUpdate()
+		return changed
 		
 	def onSourceAppeared(self, dat, _sources):
-	
-		latestSource = _sources[0].sourceName
-		sources = [_source.sourceName for _source in _sources]
-		for _source in sources:
-			if _source not in self.seqSwitch[0].par.Currentsource.menuLabels:
-				labels = self.seqSwitch[0].par.Currentsource.menuLabels
-				names = self.seqSwitch[0].par.Currentsource.menuNames
-				labels.append(_source)
-				names.append(_source)
-				self.seqSwitch[0].par.Currentsource.menuLabels = labels
-				self.seqSwitch[0].par.Currentsource.menuNames = names
-		debug(f'updating menus with {sources} cause they appeared')
-
-		for _source in sources:
-			# Update source mapping with the latest source having priority
-			debug(f'updating source mapping for {_source} because it appeared')
-			self.updateSourceMapping(_source)
-		
-		# Note: updateSourceMapping already calls broadcastStateUpdate()
-
+		"""Queue sources the NDI watcher found; a burst is routed in one pass at frame end"""
+		for _source in _sources:
+			self._disappearedBatch.pop(_source.sourceName, None)
+			self._appearedBatch[_source.sourceName] = None
+		debug(f'queued {len(_sources)} appeared sources')
+		self._scheduleSourceBatch()
 
 	def onSourceDisappeared(self, dat, sources):
+		"""Queue sources the NDI watcher lost; a burst is routed in one pass at frame end"""
 		for _source in sources:
-			_source = _source.sourceName
-			if _source in self.seqSwitch[0].par.Currentsource.menuLabels:
-				labels = self.seqSwitch[0].par.Currentsource.menuLabels
-				names = self.seqSwitch[0].par.Currentsource.menuNames
-				saved_sources = self.currentSources
-				labels.remove(_source)
-				names.remove(_source)
-				self.seqSwitch[0].par.Currentsource.menuLabels = labels
-				self.seqSwitch[0].par.Currentsource.menuNames = names
-				self.currentSources = saved_sources
-		debug(f'updating menus after sources disappeared')
+			self._appearedBatch.pop(_source.sourceName, None)
+			self._disappearedBatch[_source.sourceName] = None
+		debug(f'queued {len(sources)} disappeared sources')
+		self._scheduleSourceBatch()
+
+	def _scheduleSourceBatch(self):
+		if not self._sourceBatchScheduled:
+			self._sourceBatchScheduled = True
+			run(
+				"args[0].processSourceBatch()",
+				self,
+				endFrame=True,
+				delayRef=op.TDResources
+			)
+
+	def processSourceBatch(self):
+		"""Apply the sources that appeared/disappeared since the last batch
 		
-		# Update source mapping after sources disappeared
-		self.updateSourceMapping()
+		One menu update, one routing pass (new sources first, in the order they appeared,
+		then a remap if any source went away) and one state broadcast for the whole burst.
+		Returns the indices of the blocks whose source changed.
+		"""
+		self._sourceBatchScheduled = False
+		appeared = list(self._appearedBatch)
+		disappeared = set(self._disappearedBatch)
+		self._appearedBatch.clear()
+		self._disappearedBatch.clear()
+		if not appeared and not disappeared:
+			return []
 		
-		# Note: updateSourceMapping already calls broadcastStateUpdate()
+		self._syncNdiSources()
+		self._pushSourceMenus()
+		debug(f'updated menus: {len(appeared)} sources appeared, {len(disappeared)} disappeared')
+		
+		# Update source mapping with the new sources having priority
+		changed = self.routeSources(newSources=appeared, remap=bool(disappeared))
+		debug(f'source batch changed blocks: {changed}')
+		return changed
 
 
 	def onSpoutSourcesChanged(self, dat = None):
@@ -484,47 +523,32 @@ class NDINamedRouterExt:
 		spout_source_names = [row[0].val for row in rows]
 		debug(f'Spout sources changed: {spout_source_names}')
 		
-		# Detect newly appeared sources (in new list but not in previous)
-		newly_appeared = [name for name in spout_source_names if name not in self.previousSpoutSources]
-		
-		# Detect disappeared sources (in previous but not in new)
-		disappeared = [name for name in self.previousSpoutSources if name not in spout_source_names]
+		# Update stored Spout sources, detecting the ones that appeared and disappeared
+		newly_appeared, disappeared = self.sourceRegistry.setSpout(spout_source_names)
 		
 		if newly_appeared:
 			debug(f'>>>>>>>>>>>>>Spout sources appeared: {newly_appeared}')
 		if disappeared:
 			debug(f'>>>>>>>>>>>>>Spout sources disappeared: {disappeared}')
 		
-		# Update stored Spout sources
-		self.spoutSources = spout_source_names
-		self.previousSpoutSources = spout_source_names.copy()
-		
-		# Save current sources before updating menus (prevents TouchDesigner from changing them)
-		saved_sources = self.currentSources
-		
 		# Update dropdown menus with combined sources
-		combined_sources = self.sources
-		for block in self.seqSwitch:
-			block.par.Currentsource.menuLabels = combined_sources
-			block.par.Currentsource.menuNames = combined_sources
+		self._pushSourceMenus()
 		
-		# Restore current sources after menu update
-		self.currentSources = saved_sources
-		
-		# Auto-route newly appeared Spout sources (with SPOUT: prefix for pattern matching)
-		for source_name in newly_appeared:
-			full_source_name = f'SPOUT:{source_name}'
-			debug(f'################################Auto-routing newly appeared Spout source: {full_source_name}')
-			self.updateSourceMapping(full_source_name)
-		
-		# Broadcast state update to web interface
-		if hasattr(self, 'webHandler'):
+		# Auto-route newly appeared Spout sources (with SPOUT: prefix for pattern matching), in one pass
+		if newly_appeared:
+			full_source_names = [f'SPOUT:{source_name}' for source_name in newly_appeared]
+			debug(f'################################Auto-routing newly appeared Spout sources: {full_source_names}')
+			self.routeSources(newSources=full_source_names)
+		elif hasattr(self, 'webHandler'):
+			# Broadcast state update to web interface
 			self.webHandler.broadcastStateUpdate()
 
 
 	def RefreshSourceMapping(self):
 		"""Call this method to manually refresh the source mapping"""
 		debug('Manually refreshing source mapping')
+		self._syncNdiSources()
+		self._pushSourceMenus()
 		self.updateSourceMapping()
 		# Broadcast state update after refresh
 		if hasattr(self, 'webHandler'):
@@ -541,6 +565,7 @@ class WebHandler:
 		self.extension = extension
 		self.webSocketDAT : webSocketDAT = self.extension.ownerComp.op('websocket1')
 		self.reconnectTimer = self.extension.ownerComp.op('timer1')
+		self.encoding = 'json'  # Switched by the bridge's client_registered reply
 		
 
 	def onConnect(self, webSocketDat ):
@@ -548,6 +573,10 @@ class WebHandler:
 		debug(f'Bridge server connected to DAT: {webSocketDat.name}')
 		# Send initial state to bridge when it connects
 		self.reconnectTimer.par.initialize.pulse()
+		self.encoding = 'json'
+		if msgpack:
+			# Ask for MessagePack; the bridge answers with client_registered
+			self.sendToBridge({'action': 'register_client', 'encoding': 'msgpack'}, webSocketDat)
 		self.sendInitialState(webSocketDat)
 		debug(f'Initial state sent to bridge')
 		return
@@ -559,7 +588,7 @@ class WebHandler:
 		return
 
 	def sendToBridge(self, message, webSocketDAT=None):
-		"""Send message to bridge server (which broadcasts to all browsers)"""
+		"""Send message (dict, or JSON text) to bridge server (which broadcasts to all browsers)"""
 		if webSocketDAT is None:
 			webSocketDAT = self.webSocketDAT
 			
@@ -568,7 +597,12 @@ class WebHandler:
 			return
 			
 		try:
-			webSocketDAT.sendText(message)
+			if self.encoding == 'msgpack':
+				if isinstance(message, str):
+					message = json.loads(message)
+				webSocketDAT.sendBinary(msgpack.packb(message, use_bin_type=True))
+			else:
+				webSocketDAT.sendText(message if isinstance(message, str) else json.dumps(message))
 			debug(f'Message sent to bridge')
 		except Exception as e:
 			debug(f'Failed to send to bridge: {e}')
@@ -584,9 +618,7 @@ class WebHandler:
 				'action': 'state_update',
 				'state': state
 			}
-			message = json.dumps(response)
-			debug(f'Sending state: {message[:200]}...')
-			self.sendToBridge(message, webSocketDAT)
+			self.sendToBridge(response, webSocketDAT)
 			debug('State sent to bridge')
 		else:
 			debug('WARNING: Extension not found')
@@ -601,11 +633,23 @@ class WebHandler:
 			'block_idx': block_idx,
 			'source_name': source_name
 		}
-		message = json.dumps(response)
 		debug(f'Source change message: {response}')
-		self.sendToBridge(message, webSocketDAT)
+		self.sendToBridge(response, webSocketDAT)
 		debug('Source change sent to bridge')
 		
+	def acknowledgeSetSources(self, applied, failed, webSocketDAT):
+		"""One sources_changed for a set_sources batch, then one state update"""
+		response = {
+			'action': 'sources_changed',
+			'component_id': self.extension.componentId,
+			'routes': applied,
+			'failed': failed
+		}
+		self.sendToBridge(response, webSocketDAT)
+		self.broadcastStateUpdate(webSocketDAT)
+		self.extension.endSetSources()
+		debug(f'Set sources batch acknowledged: {len(applied)} applied, {len(failed)} failed')
+	
 	def sendInitialState(self, webSocketDAT):
 		"""Send initial state to bridge (bridge will forward to requesting browser)"""
 		debug('Sending initial state to bridge')
@@ -619,7 +663,7 @@ class WebHandler:
 				'state': state
 			}
 			debug(f'Sending state response: {json.dumps(response)[:200]}...')
-			webSocketDAT.sendText(json.dumps(response))
+			self.sendToBridge(response, webSocketDAT)
 			debug('Initial state sent to bridge')
 		else:
 			debug('WARNING: Extension not found, cannot send initial state')
@@ -629,7 +673,8 @@ class WebHandler:
 		#debug(f'Handling message: {message}')
 		
 		try:
-			data = json.loads(message)
+			# Text frames are JSON, binary frames MessagePack
+			data = msgpack.unpackb(bytes(message), raw=False) if isinstance(message, (bytes, bytearray)) else json.loads(message)
 			#debug(f'JSON parsed successfully: {data}')
 			action = data.get('action')
 			#debug(f'Action extracted: {action}')
@@ -640,7 +685,7 @@ class WebHandler:
 					'action': 'error',
 					'message': 'NDI Named Switcher extension not found'
 				}
-				webSocketDAT.sendText( json.dumps(error_response))
+				self.sendToBridge(error_response, webSocketDAT)
 				return
 			
 			# Check if this message is for this specific component
@@ -660,7 +705,7 @@ class WebHandler:
 					'state': state
 				}
 				debug(f'Sending state response for request: {json.dumps(response)[:200]}...')
-				webSocketDAT.sendText( json.dumps(response))
+				self.sendToBridge(response, webSocketDAT)
 				debug('State response sent successfully')
 				
 			elif action == 'set_source':
@@ -683,7 +728,7 @@ class WebHandler:
 							'state': state
 						}
 						debug(f'Sending updated state: {json.dumps(response)[:200]}...')
-						webSocketDAT.sendText( json.dumps(response))
+						self.sendToBridge(response, webSocketDAT)
 						debug('Updated state sent successfully')
 					else:
 						debug('Set source failed, sending error response')
@@ -691,14 +736,35 @@ class WebHandler:
 							'action': 'error',
 							'message': f'Failed to set source for block {block_idx}'
 						}
-						webSocketDAT.sendText( json.dumps(error_response))
+						self.sendToBridge(error_response, webSocketDAT)
 				else:
 					debug('Invalid set_source parameters, sending error response')
 					error_response = {
 						'action': 'error',
 						'message': 'Invalid set_source parameters'
 					}
-					webSocketDAT.sendText( json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
+			
+			elif action == 'set_sources':
+				debug('Processing set_sources action')
+				routes = data.get('routes')
+				
+				if isinstance(routes, list) and all(isinstance(route, dict) for route in routes):
+					applied, failed = self.extension.handleSetSources(routes)
+					# Acknowledged at frame end, once the parameter callbacks of the batch have run
+					run(
+						"args[0].acknowledgeSetSources(args[1], args[2], args[3])",
+						self, applied, failed, webSocketDAT,
+						endFrame=True,
+						delayRef=op.TDResources
+					)
+				else:
+					debug('Invalid set_sources parameters, sending error response')
+					error_response = {
+						'action': 'error',
+						'message': 'Invalid set_sources parameters'
+					}
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'refresh_sources':
 				debug('Processing refresh_sources action')
@@ -714,7 +780,7 @@ class WebHandler:
 						'state': state
 					}
 					debug(f'Sending refreshed state: {json.dumps(response)[:200]}...')
-					webSocketDAT.sendText( json.dumps(response))
+					self.sendToBridge(response, webSocketDAT)
 					debug('Refreshed state sent successfully')
 				else:
 					debug('Refresh sources failed, sending error response')
@@ -722,7 +788,7 @@ class WebHandler:
 						'action': 'error',
 						'message': 'Failed to refresh sources'
 					}
-					webSocketDAT.sendText( json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'set_lock':
 				debug('Processing set_lock action')
@@ -741,20 +807,20 @@ class WebHandler:
 							'action': 'state_update',
 							'state': state
 						}
-						webSocketDAT.sendText(json.dumps(response))
+						self.sendToBridge(response, webSocketDAT)
 						debug('Lock state updated successfully')
 					else:
 						error_response = {
 							'action': 'error',
 							'message': f'Invalid block index: {block_idx}'
 						}
-						webSocketDAT.sendText(json.dumps(error_response))
+						self.sendToBridge(error_response, webSocketDAT)
 				else:
 					error_response = {
 						'action': 'error',
 						'message': 'Invalid set_lock parameters'
 					}
-					webSocketDAT.sendText(json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'set_lock_global':
 				debug('Processing set_lock_global action')
@@ -771,14 +837,14 @@ class WebHandler:
 						'action': 'state_update',
 						'state': state
 					}
-					webSocketDAT.sendText(json.dumps(response))
+					self.sendToBridge(response, webSocketDAT)
 					debug('Global lock state updated successfully')
 				else:
 					error_response = {
 						'action': 'error',
 						'message': 'Invalid set_lock_global parameters'
 					}
-					webSocketDAT.sendText(json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'save_configuration':
 				debug('Processing save_configuration action')
@@ -794,7 +860,7 @@ class WebHandler:
 						'message': 'Configuration saved successfully'
 					}
 					debug('Sending configuration saved response')
-					webSocketDAT.sendText( json.dumps(response))
+					self.sendToBridge(response, webSocketDAT)
 					debug('Configuration saved response sent successfully')
 				else:
 					debug('Save configuration failed, sending error response')
@@ -802,7 +868,7 @@ class WebHandler:
 						'action': 'error',
 						'message': 'Failed to save configuration'
 					}
-					webSocketDAT.sendText( json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'recall_configuration':
 				debug('Processing recall_configuration action')
@@ -818,7 +884,7 @@ class WebHandler:
 						'message': 'Configuration recalled successfully'
 					}
 					debug('Sending configuration recalled response')
-					webSocketDAT.sendText( json.dumps(response))
+					self.sendToBridge(response, webSocketDAT)
 					debug('Configuration recalled response sent successfully')
 				else:
 					debug('Recall configuration failed, sending error response')
@@ -826,7 +892,7 @@ class WebHandler:
 						'action': 'error',
 						'message': 'Failed to recall configuration'
 					}
-					webSocketDAT.sendText( json.dumps(error_response))
+					self.sendToBridge(error_response, webSocketDAT)
 			
 			elif action == 'ping':
 				#debug('Processing ping action')
@@ -835,9 +901,14 @@ class WebHandler:
 					'timestamp': time.time()
 				}
 				#debug('Sending pong response')
-				webSocketDAT.sendText( json.dumps(pong_response))
+				self.sendToBridge(pong_response, webSocketDAT)
 				#debug('Pong response sent')
 			
+			elif action == 'client_registered':
+				# Bridge confirmed the wire encoding for everything after this message
+				self.encoding = data.get('encoding', 'json')
+				debug(f'Bridge wire encoding: {self.encoding}')
+			
 			elif action == 'error':
 				# Ignore error messages (they're informational only, don't respond)
 				debug(f'Error message received: {data.get("message")}')
@@ -850,6 +921,10 @@ class WebHandler:
 				# Ignore source change notifications from other components
 				debug('Received source_changed from another component (ignoring)')
 			
+			elif action == 'sources_changed':
+				# Ignore batched source change notifications from other components
+				debug('Received sources_changed from another component (ignoring)')
+			
 			elif action == 'configuration_saved':
 				# Ignore configuration saved notifications from other components
 				debug('Received configuration_saved from another component (ignoring)')
@@ -864,7 +939,7 @@ class WebHandler:
 					'action': 'error',
 					'message': f'Unknown action: {action}'
 				}
-				webSocketDAT.sendText( json.dumps(error_response))
+				self.sendToBridge(error_response, webSocketDAT)
 		
 		except Exception as e:
 			debug(f'Exception in handleMessage: {e}')
@@ -872,7 +947,7 @@ class WebHandler:
 				'action': 'error',
 				'message': f'Error processing message: {str(e)}'
 			}
-			webSocketDAT.sendText( json.dumps(error_response))
+			self.sendToBridge(error_response, webSocketDAT)
 
 	def _outputResolution(self, block_idx):
 		return self.mapping[block_idx].par.Resx.eval(), self.mapping[block_idx].par.Resy.eval()
\ No newline at end of file
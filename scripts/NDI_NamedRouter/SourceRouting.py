@@ -0,0 +1,357 @@
+'''Auto-routing rules of the NDI Named Router, free of TouchDesigner
+
+NDINamedRouterExt reads its switch blocks into Block tuples, asks a SourceRouter
+where each one should point and writes back the blocks that changed, so these
+rules can be checked and profiled in plain Python (benchmarks/bench_routing.py).
+The known NDI and Spout sources are kept in a SourceRegistry.
+'''
+import re
+from collections import namedtuple
+
+SPOUT_PREFIX = 'SPOUT:'
+
+# One switch block: its Sourceregex, Currentsource and Lock
+Block = namedtuple('Block', ['pattern', 'current', 'locked'])
+
+# assignments: source per block after routing, changed: blocks whose source moved,
+# matched: blocks now showing a source that matches their pattern (or a manual pick)
+RoutingResult = namedtuple('RoutingResult', ['assignments', 'changed', 'matched'])
+
+def matchableName(source):
+	"""Name patterns are matched against: Spout sources without their SPOUT: prefix"""
+	return source[len(SPOUT_PREFIX):] if source.startswith(SPOUT_PREFIX) else source
+
+def transformPatternForPlurals(pattern, enablePluralHandling=True):
+	"""Transform a regex pattern to handle both singular and plural forms
+
+	This adds 's?' to word endings when plural handling is enabled.
+	It's designed to be conservative and only modify simple word patterns.
+	The closing parenthesis is optional to support both NDI (with parentheses) and Spout (without).
+	"""
+	if not enablePluralHandling:
+		return pattern + r'\)?'  # Optional closing parenthesis
+
+	# Only apply to simple patterns that end with word characters
+	# This avoids breaking complex regex patterns
+	if re.match(r'^[a-zA-Z0-9_.*]+$', pattern):
+		# Look for word endings and add s? if they don't already have it
+		# This handles patterns like 'projector' -> 'projectors?'
+		# But leaves patterns like 'projector.*' or 'projectors?' unchanged
+		if re.search(r'[a-zA-Z0-9_]$', pattern) and not pattern.endswith('s?'):
+			transformed = pattern + r's?\)?'  # Optional closing parenthesis
+			return transformed
+
+	return pattern + r'\)?'  # Optional closing parenthesis
+
+REGEX_SPECIAL = frozenset('.^$*+?{}[]|()\\')
+QUANTIFIER_BODY = re.compile(r'\{[0-9,]*\}')
+
+def escapeWidth(pattern, i):
+	"""Length of the backslash escape with a letter or digit starting at pattern[i]"""
+	nxt = pattern[i + 1]
+	if nxt in 'xuU':
+		return 2 + {'x': 2, 'u': 4, 'U': 8}[nxt]
+	if nxt == 'N':
+		end = pattern.find('}', i)
+		return (end + 1 - i) if end > 0 else 2
+	if nxt.isdigit():
+		end = i + 2
+		while end < len(pattern) and end < i + 4 and pattern[end].isdigit():
+			end += 1
+		return end - i
+	return 2
+
+def requiredLiteral(pattern):
+	"""Longest run of plain characters every match of pattern must contain, '' if none is known"""
+	if '(?' in pattern:
+		return ''  # Inline flags and extensions can change what characters mean
+	best, run, depth, i = '', '', 0, 0
+	while i < len(pattern):
+		char = pattern[i]
+		if char == '\\' and i + 1 < len(pattern):
+			nxt = pattern[i + 1]
+			if not nxt.isalnum():
+				literal, width = nxt, 2
+			else:
+				# Classes, anchors, hex/octal/named characters and backreferences: a break,
+				# consuming the whole escape so its digits aren't taken for literals
+				literal, width = None, escapeWidth(pattern, i)
+		elif char == '{':
+			# A quantifier body ({3}, {1,2}) is skipped whole so its digits aren't taken for literals
+			body = QUANTIFIER_BODY.match(pattern, i)
+			literal, width = None, len(body.group()) if body else 1
+		elif char == '[':
+			start = i + 1
+			if pattern[start:start + 1] == '^':
+				start += 1
+			if pattern[start:start + 1] == ']':
+				start += 1
+			end = pattern.find(']', start)
+			if end < 0 or '\\' in pattern[i:end]:
+				return ''
+			literal, width = None, end + 1 - i
+		elif char == '|':
+			if depth == 0:
+				return ''  # Alternatives at the top: nothing is required
+			literal, width = None, 1
+		elif char == '(':
+			depth += 1
+			literal, width = None, 1
+		elif char == ')':
+			depth -= 1
+			literal, width = None, 1
+		elif char in REGEX_SPECIAL:
+			literal, width = None, 1
+		else:
+			literal, width = char, 1
+		i += width
+		quantifier = pattern[i] if i < len(pattern) else ''
+		if literal is not None and depth == 0 and quantifier not in ('*', '?', '{'):
+			run += literal
+			if quantifier != '+':
+				continue
+		if len(run) > len(best):
+			best = run
+		run = ''
+	if len(run) > len(best):
+		best = run
+	return best.lower() if best.isascii() else ''
+
+class SourceRegistry:
+	"""NDI and Spout source names with set membership, in the order they were discovered
+
+	Iterating gives the combined list the menus show: NDI names, then Spout names with
+	the SPOUT: prefix. It is cached until setNdi()/setSpout() actually change something,
+	which also bumps version.
+	"""
+	def __init__(self):
+		# name -> None: dicts as insertion-ordered sets
+		self._ndi = {}
+		self._spout = {}
+		self._combined = None
+		self._combinedSet = None
+		self._localOnly = None
+		self.version = 0
+
+	def _replace(self, current, names):
+		names = dict.fromkeys(names)
+		if list(names) == list(current):
+			return current, [], []
+		appeared = [name for name in names if name not in current]
+		disappeared = [name for name in current if name not in names]
+		self._combined = self._combinedSet = self._localOnly = None
+		self.version += 1
+		return names, appeared, disappeared
+
+	def setNdi(self, names):
+		"""Replace the NDI sources, returns (appeared, disappeared)"""
+		self._ndi, appeared, disappeared = self._replace(self._ndi, names)
+		return appeared, disappeared
+
+	def setSpout(self, names):
+		"""Replace the Spout sender names (without prefix), returns (appeared, disappeared)"""
+		self._spout, appeared, disappeared = self._replace(self._spout, names)
+		return appeared, disappeared
+
+	@property
+	def ndi(self):
+		return list(self._ndi)
+
+	@property
+	def spout(self):
+		return list(self._spout)
+
+	@property
+	def localOnly(self):
+		"""Spout sources with their SPOUT: prefix, only available on this machine"""
+		if self._localOnly is None:
+			self._localOnly = [SPOUT_PREFIX + name for name in self._spout]
+		return self._localOnly
+
+	@property
+	def combined(self):
+		"""Cached NDI + prefixed Spout list, shared: don't modify it"""
+		if self._combined is None:
+			self._combined = list(self._ndi) + self.localOnly
+		return self._combined
+
+	def __contains__(self, source):
+		if self._combinedSet is None:
+			self._combinedSet = set(self.combined)
+		return source in self._combinedSet
+
+	def __iter__(self):
+		return iter(self.combined)
+
+	def __len__(self):
+		return len(self.combined)
+
+class PatternMatcher:
+	"""Finds every block whose pattern fully matches a source name
+
+	Python's re can't report all the alternatives of a combined pattern that match,
+	so each pattern is indexed by a literal all of its matches contain: a name is only
+	tried against patterns whose literal occurs in it, once per distinct pattern.
+	"""
+	def __init__(self, entries):
+		# entries: (block_idx, effective pattern, compiled regex or None) in block order
+		groups = {}
+		for blockIdx, effective, compiledPattern in entries:
+			if compiledPattern is not None:
+				groups.setdefault(effective, (compiledPattern, []))[1].append(blockIdx)
+		self.candidates = [
+			(requiredLiteral(effective), compiledPattern, blocks)
+			for effective, (compiledPattern, blocks) in groups.items()
+		]
+
+	def matches(self, name):
+		"""Ascending indices of the blocks whose pattern fully matches name"""
+		# Fold the way IGNORECASE compares, so the literal check never rejects a match
+		folded = name.casefold().replace('\u0131', 'i')
+		found = []
+		for literal, compiledPattern, blocks in self.candidates:
+			if literal in folded and compiledPattern.fullmatch(name):
+				found.extend(blocks)
+		found.sort()
+		return found
+
+class SourceRouter:
+	"""Decides which source each block shows when sources come and go
+
+	All matching is case-insensitive and against matchableName(). Compiled patterns
+	are cached per (pattern, plural handling) until clear() is called.
+	"""
+	def __init__(self, enablePluralHandling=True, log=None):
+		self.enablePluralHandling = enablePluralHandling
+		self.log = log or (lambda message: None)
+		# (pattern, plural handling) -> (effective pattern, compiled regex or None, error or None)
+		self._patternCache = {}
+		# ((patterns), plural handling) -> PatternMatcher for all blocks
+		self._patternMatcher = (None, None)
+
+	def clear(self):
+		"""Drop compiled patterns, e.g. after a Sourceregex changed"""
+		self._patternCache.clear()
+		self._patternMatcher = (None, None)
+
+	def patternEntry(self, pattern):
+		"""Effective pattern, compiled case-insensitive regex and error for a block's Sourceregex
+
+		An invalid pattern is compiled once and flagged (regex None, error set) so routing skips it.
+		"""
+		key = (pattern, self.enablePluralHandling)
+		entry = self._patternCache.get(key)
+		if entry is None:
+			effective = transformPatternForPlurals(pattern, self.enablePluralHandling)
+			try:
+				entry = (effective, re.compile(effective, re.IGNORECASE), None)
+			except re.error as e:
+				self.log(f'Invalid source regex {pattern!r}: {e}')
+				entry = (effective, None, str(e))
+			self._patternCache[key] = entry
+		return entry
+
+	def patternMatcher(self, patterns):
+		"""PatternMatcher over the given per-block patterns, rebuilt when they change"""
+		key = (tuple(patterns), self.enablePluralHandling)
+		if self._patternMatcher[0] != key:
+			entries = [(blockIdx,) + self.patternEntry(pattern)[:2] for blockIdx, pattern in enumerate(patterns)]
+			self._patternMatcher = (key, PatternMatcher(entries))
+		return self._patternMatcher[1]
+
+	def routeNew(self, blocks, newSources, globalLock=False):
+		"""Where each block should point after newSources appeared, as a RoutingResult
+
+		Blocks whose pattern matches a new source switch to it, the most recent one
+		(last in newSources) winning where several match, like routing them one by one.
+		The other blocks keep their source. Locked blocks never move, and nothing moves
+		under globalLock.
+		"""
+		assignments = [block.current for block in blocks]
+		matched = []
+		if globalLock:
+			self.log('Global lock enabled - skipping auto-routing')
+			return RoutingResult(assignments, [], matched)
+
+		# Only update blocks whose regex patterns match one of the new sources
+		self.log(f'Updating only blocks that match new sources: {newSources}')
+		matcher = self.patternMatcher([block.pattern for block in blocks])
+		newSourceFor = {}
+		for source in newSources:
+			for blockIdx in matcher.matches(matchableName(source)):
+				newSourceFor[blockIdx] = source
+		for blockIdx, block in enumerate(blocks):
+			if block.locked:
+				self.log(f'Block {blockIdx} is locked - skipping auto-routing')
+				continue
+			transformedPattern, compiledPattern, _ = self.patternEntry(block.pattern)
+			if compiledPattern is None:
+				self.log(f'Block {blockIdx} has an invalid pattern - skipping auto-routing')
+				continue
+			if blockIdx in newSourceFor:
+				assignments[blockIdx] = newSourceFor[blockIdx]
+				matched.append(blockIdx)
+				self.log(f'Updated block {blockIdx} to use new source: {assignments[blockIdx]}')
+			elif block.current and compiledPattern.fullmatch(matchableName(block.current)):
+				# Current source is still valid for this block, don't change it
+				matched.append(blockIdx)
+				self.log(f'Block {blockIdx} keeping current source: {block.current}')
+
+		changed = [blockIdx for blockIdx, block in enumerate(blocks) if assignments[blockIdx] != block.current]
+		return RoutingResult(assignments, changed, matched)
+
+	def route(self, sources, blocks, globalLock=False):
+		"""Where each block should point after sources changed, as a RoutingResult
+
+		Blocks keep a source that is still listed or still matches their pattern, and the
+		others take the first source in sources that matches. Locked blocks never move,
+		and nothing moves under globalLock. Sources that just appeared go to routeNew().
+		"""
+		assignments = [block.current for block in blocks]
+		matched = []
+		if globalLock:
+			self.log('Global lock enabled - skipping auto-routing')
+			return RoutingResult(assignments, [], matched)
+
+		patterns = [block.pattern for block in blocks]
+		# For each block, if the current source matches its regex keep it, otherwise find a matching one
+		self.log('Updating all blocks based on current state')
+		listed = sources if isinstance(sources, SourceRegistry) else set(sources)
+		needSource = []
+		for blockIdx, block in enumerate(blocks):
+			if block.locked:
+				self.log(f'Block {blockIdx} is locked - skipping auto-routing')
+				continue
+			# this is to prevent overriding a manual source change
+			if block.current in listed:
+				matched.append(blockIdx)
+				continue
+			transformedPattern, compiledPattern, _ = self.patternEntry(block.pattern)
+			if compiledPattern is None:
+				self.log(f'Block {blockIdx} has an invalid pattern - skipping auto-routing')
+				continue
+			if block.current and compiledPattern.fullmatch(matchableName(block.current)):
+				matched.append(blockIdx)
+				self.log(f'Block {blockIdx} keeping current source: {block.current} (still matches pattern)')
+				continue
+			needSource.append(blockIdx)
+
+		# One pass over the sources in order: each block gets the first source its pattern matches
+		waiting = set(needSource)
+		if waiting:
+			matcher = self.patternMatcher(patterns)
+			for source in sources:
+				for blockIdx in matcher.matches(matchableName(source)):
+					if blockIdx in waiting:
+						assignments[blockIdx] = source
+						matched.append(blockIdx)
+						waiting.discard(blockIdx)
+						self.log(f'Updated block {blockIdx} to new matching source: {source}')
+				if not waiting:
+					break
+		for blockIdx in sorted(waiting):
+			self.log(f'No sources match pattern {blockIdx}: {self.patternEntry(patterns[blockIdx])[0]}')
+		matched.sort()
+
+		changed = [blockIdx for blockIdx, block in enumerate(blocks) if assignments[blockIdx] != block.current]
+		return RoutingResult(assignments, changed, matched)
@@ -78,9 +78,10 @@ async def parseJSON(message, dat):
 # Only binary frame messages will be handled in this function.
 
 def onReceiveBinary(dat, contents):
-	"""Called when a binary message is received"""
-	debug(f'Binary message received (not implemented): {len(contents)} bytes')
-	# Not used for this application
+	"""Called when a binary message is received (MessagePack, once negotiated)"""
+	debug(f'Binary message received: {len(contents)} bytes')
+	coroutines = [parseJSON(contents, dat)]
+	op.TDAsyncIO.Run(coroutines)
 	return
 
 # me - this DAT
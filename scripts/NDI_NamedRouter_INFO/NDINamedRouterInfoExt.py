@@ -3,6 +3,11 @@ import json
 from TDStoreTools import DependDict, StorageManager
 from collections import namedtuple
 
+try:
+	import msgpack  # Optional: binary wire format to the bridge
+except ImportError:
+	msgpack = None
+
 CustomParHelper: CustomParHelper = next(d for d in me.docked if 'ExtUtils' in d.tags).mod('CustomParHelper').CustomParHelper # import
 ###
 
@@ -21,11 +26,15 @@ class NDINamedRouterInfoExt:
 
 		self.reconnectTimer = self.ownerComp.op('timer3')
 
+		# Only these merged-state fields are requested from the bridge
+		self.stateFields = ['output_names', 'current_sources', 'output_resolutions', 'sources']
+
 		# Connection settings
 		self.autoReconnect = True
 		
 		# Current state data
 		self.currentState = {}
+		self.encoding = 'json'  # Switched by the bridge's client_registered reply
 
 		self.resetSocket()
 		
@@ -154,16 +163,26 @@ class NDINamedRouterInfoExt:
 		"""Set a source for a specific output block"""
 		return self._setSource(block_idx, source_name)
 	
+	def setSources(self, routes):
+		"""Set many sources at once, routes being (block_idx, source_name) pairs"""
+		return self.sendMessage({
+			'action': 'set_sources',
+			'routes': [{'block_idx': block_idx, 'source_name': source_name} for block_idx, source_name in routes]
+		})
+	
 	def sendPing(self):
 		"""Send ping to server"""
 		return self._sendPing()
 	
 	def sendMessage(self, message_dict):
-		"""Send a JSON message to the server"""
+		"""Send a message to the server (JSON, or MessagePack once negotiated)"""
 		if self.webSocket and self.isConnected():
 			try:
-				message = json.dumps(message_dict)
-				self.webSocket.sendText(message)  # Use WebSocketDAT method
+				if self.encoding == 'msgpack':
+					self.webSocket.sendBinary(msgpack.packb(message_dict, use_bin_type=True))
+				else:
+					message = json.dumps(message_dict)
+					self.webSocket.sendText(message)  # Use WebSocketDAT method
 				debug(f'[NDI Info Ext] Message sent: {message_dict.get("action", "unknown")}')
 				return True
 			except Exception as e:
@@ -175,7 +194,8 @@ class NDINamedRouterInfoExt:
 	
 	def _requestState(self):
 		"""Internal method to request current state from the server"""
-		return self.sendMessage({'action': 'request_state'})
+		# Projection: the bridge skips regexes, locks and component info we don't use
+		return self.sendMessage({'action': 'request_state', 'fields': self.stateFields})
 	
 	def _refreshSources(self):
 		"""Internal method to request server to refresh its sources"""
@@ -202,11 +222,15 @@ class NDINamedRouterInfoExt:
 		"""Called when WebSocket connection is established"""
 		debug('[NDI Info Ext] Connected to NDI Named Router server')
 		# Register as info-only client with auto-update preference
-		self.sendMessage({
+		self.encoding = 'json'
+		register = {
 			'action': 'register_client',
 			'client_type': 'info',
 			'auto_update': self.isPeriodicUpdate  # Only get broadcasts if periodic updates are enabled
-		})
+		}
+		if msgpack:
+			register['encoding'] = 'msgpack'  # Bridge confirms with client_registered
+		self.sendMessage(register)
 		# Request initial state from server
 		self.reconnectTimer.par.initialize.pulse()
 		self._requestState()
@@ -221,7 +245,8 @@ class NDINamedRouterInfoExt:
 		debug(f'[NDI Info Ext] Received WebSocket message: {message[:100]}...')
 		
 		try:
-			data = json.loads(message)
+			# Text frames are JSON, binary frames MessagePack
+			data = msgpack.unpackb(bytes(message), raw=False) if isinstance(message, (bytes, bytearray)) else json.loads(message)
 			action = data.get('action', 'unknown')
 			
 			debug(f'[NDI Info Ext] Processing action: {action}')
@@ -236,9 +261,18 @@ class NDINamedRouterInfoExt:
 				source_name = data.get('source_name')
 				self.handleSourceChange(block_idx, source_name)
 				
+			elif action == 'sources_changed':
+				# Handle a batch of source changes
+				for route in data.get('routes', []):
+					self.handleSourceChange(route.get('block_idx'), route.get('source_name'))
+				
 			elif action == 'pong':
 				debug('[NDI Info Ext] Received pong response')
 				
+			elif action == 'client_registered':
+				self.encoding = data.get('encoding', 'json')
+				debug(f'[NDI Info Ext] Bridge wire encoding: {self.encoding}')
+				
 			elif action == 'error':
 				error_msg = data.get('message', 'Unknown error')
 				debug(f'[NDI Info Ext] Server error: {error_msg}')
@@ -252,8 +286,9 @@ class NDINamedRouterInfoExt:
 			debug(f'[NDI Info Ext] Error processing message: {e}')
 	
 	def onWebSocketReceiveBinary(self, dat, contents):
-		"""Called when binary message is received"""
-		debug(f'[NDI Info Ext] Binary message received: {len(contents)} bytes (not implemented)')
+		"""Called when binary message is received (MessagePack, once negotiated)"""
+		debug(f'[NDI Info Ext] Binary message received: {len(contents)} bytes')
+		self.onWebSocketReceiveText(dat, contents)
 	
 	def onWebSocketReceivePing(self, dat, contents):
 		"""Called when ping is received"""
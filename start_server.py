@@ -5,19 +5,45 @@ Starts HTTP server to serve the web interface + WebSocket bridge
 TouchDesigner connects to the bridge as a CLIENT
 """
 
-import http.server
-import socketserver
 import os
 import sys
 import webbrowser
 import threading
 import time
+import traceback
 import socket
 import platform
 import argparse
 import asyncio
+import bisect
+import re
 import websockets
 import json
+import collections
+import errno
+import fnmatch
+import gzip
+import hashlib
+import mimetypes
+import multiprocessing
+import secrets
+import urllib.parse
+from http import HTTPStatus
+
+try:
+    import brotli  # Optional: brotli-compressed index page
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack  # Optional: binary wire format for clients that negotiate it
+except ImportError:
+    msgpack = None
+
+try:
+    import uvloop  # Optional: faster event loop (--loop uvloop)
+except ImportError:
+    uvloop = None
 
 def get_local_ip():
     """Get the local IP address for network access"""
@@ -58,8 +84,222 @@ def find_available_port(start_port=80):
     print("No available ports found in range!")
     return None
 
-def start_server(port=80, websocket_port=8080, auto_open=True):
-    """Start the static file server"""
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(PROJECT_DIR, 'templates')  # The only directory served over HTTP
+INDEX_TEMPLATE = os.path.join(STATIC_DIR, 'index.html')
+WS_PORT_LINE = "const WS_PORT = '8080';  // TouchDesigner WebSocket DAT port (direct connection)"
+WS_PATH_LINE = "const WS_PATH = '';  // Browser endpoint path, set by start_server.py in single-port mode"
+SINGLE_PORT_BROWSER_PATH = '/ws/browser'
+SINGLE_PORT_TD_PATHS = ('/', '/ws/td')  # TD WebSocket DATs connect without a path
+PEER_PATH = '/peer'  # Other bridges connect to the TD port on this path
+PEER_RETRY_DELAY = 3  # Seconds between attempts to (re)connect to a peer bridge
+SCENES_FILE = os.path.join(PROJECT_DIR, 'scenes.jsonl')
+STATE_FILE = os.path.join(PROJECT_DIR, 'bridge_state.json')
+STATE_SNAPSHOT_MAX_AGE = 24 * 3600  # Seconds a saved component state stays worth restoring
+STATE_RESTORE_GRACE = 300  # Seconds a restored component waits for its TD to reconnect before it is removed
+HTTP_KEEPALIVE_TIMEOUT = 15  # Seconds an idle keep-alive HTTP connection stays open
+LOOP_LAG_INTERVAL = 0.1  # Seconds between event loop lag measurements
+IPC_HIGH_WATER = 64 * 1024 * 1024  # Bytes buffered for a worker link before the other process counts as stuck
+
+class IndexPage:
+    """templates/index.html rendered once, kept in memory with compressed variants
+
+    The WebSocket port is substituted at render time. The template is re-read
+    only when its mtime changes (checked at most once per second), and every
+    rendering gets a strong ETag so browsers revalidate with a cheap 304.
+    """
+
+    def __init__(self, websocket_port, ws_path='', path=INDEX_TEMPLATE):
+        self.websocket_port = websocket_port
+        self.ws_path = ws_path
+        self.path = path
+        self.mtime = None
+        self.variants = {}  # Content-Encoding ('identity', 'gzip', 'br') -> body
+        self.etag = None
+        self._checked_at = 0
+        self.refresh()
+
+    def render(self, html_content):
+        # Replace the WebSocket port placeholder with the actual port
+        html_content = html_content.replace(
+            WS_PORT_LINE,
+            f"const WS_PORT = '{self.websocket_port}';  // TouchDesigner WebSocket DAT port (direct connection)"
+        )
+        if self.ws_path:
+            html_content = html_content.replace(
+                WS_PATH_LINE,
+                f"const WS_PATH = '{self.ws_path}';  // Browser endpoint path, set by start_server.py in single-port mode"
+            )
+        return html_content
+
+    def refresh(self):
+        """Re-render if the template changed on disk"""
+        now = time.monotonic()
+        if self.mtime is not None and now - self._checked_at < 1:
+            return
+        self._checked_at = now
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            body = self.render(f.read()).encode('utf-8')
+        variants = {'identity': body, 'gzip': gzip.compress(body, 9)}
+        if brotli:
+            variants['br'] = brotli.compress(body)
+        self.variants = variants
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self.mtime = mtime
+        print(f"Rendered index.html with WebSocket port {self.websocket_port} ({', '.join(f'{k}: {len(v)} bytes' for k, v in variants.items())})")
+
+    def pick_encoding(self, accept_encoding):
+        accepted = {token.split(';')[0].strip() for token in accept_encoding.lower().split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.variants:
+                return encoding
+        return 'identity'
+
+def is_served(path):
+    """Whether path lies in the directory the HTTP server serves files from"""
+    static_dir = os.path.realpath(STATIC_DIR)
+    return os.path.commonpath([os.path.realpath(path), static_dir]) == static_dir
+
+def http_response(method, target, headers, index_page):
+    """Build (status, headers, body) for an HTTP request
+
+    Transport-agnostic so any listener on the event loop can use it. headers
+    must be a case-insensitive mapping or a dict with lower-case keys.
+    """
+    path = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+    if method not in ('GET', 'HEAD'):
+        return HTTPStatus.METHOD_NOT_ALLOWED, [('Allow', 'GET, HEAD')], b''
+    
+    if path == '/' or path == '/index.html':
+        try:
+            index_page.refresh()
+        except OSError as e:
+            print(f"Error serving index.html: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, [('Content-Type', 'text/plain')], f"Error loading index.html: {e}".encode()
+        common = [
+            ('ETag', index_page.etag),
+            ('Cache-Control', 'no-cache'),  # Always revalidate, a matching ETag costs a 304
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if_none_match = headers.get('if-none-match', '')
+        if index_page.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return HTTPStatus.NOT_MODIFIED, common, b''
+        encoding = index_page.pick_encoding(headers.get('accept-encoding', ''))
+        response_headers = [('Content-Type', 'text/html; charset=utf-8')] + common
+        if encoding != 'identity':
+            response_headers.append(('Content-Encoding', encoding))
+        return HTTPStatus.OK, response_headers, index_page.variants[encoding]
+    
+    if path == '/favicon.ico':
+        # Handle favicon request gracefully - return empty 204 response
+        return HTTPStatus.NO_CONTENT, [], b''
+    
+    if path == '/status':
+        body = json.dumps(bridge_stats(), indent=2).encode('utf-8')
+        return HTTPStatus.OK, [('Content-Type', 'application/json'), ('Cache-Control', 'no-store')], body
+    
+    # For other files, serve them from templates/ only, never the scenes or state files
+    file_path = os.path.realpath(os.path.join(STATIC_DIR, path.lstrip('/')))
+    if not is_served(file_path) or not os.path.isfile(file_path):
+        return HTTPStatus.NOT_FOUND, [('Content-Type', 'text/plain')], b'File not found'
+    with open(file_path, 'rb') as f:
+        body = f.read()
+    content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    return HTTPStatus.OK, [('Content-Type', content_type)], body
+
+async def handle_http_connection(reader, writer, index_page):
+    """Minimal HTTP/1.1 server for the web interface (GET/HEAD, keep-alive)"""
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HTTP_KEEPALIVE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            try:
+                content_length = int(headers.get('content-length', '0'))
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+            if content_length:
+                try:
+                    await reader.readexactly(content_length)  # Ignore request bodies
+                except asyncio.IncompleteReadError:
+                    break
+            
+            status, response_headers, body = http_response(method, target, headers, index_page)
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+            
+            lines = [f'HTTP/1.1 {status.value} {status.phrase}']
+            lines += [f'{name}: {value}' for name, value in response_headers]
+            if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+                lines.append(f'Content-Length: {len(body)}')
+            lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+            print(f"[HTTP] {method} {target} {status.value}")
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def start_http_server(port, websocket_port):
+    """Serve the web interface from the running asyncio event loop"""
+    index_page = IndexPage(websocket_port)
+    return await asyncio.start_server(
+        lambda reader, writer: handle_http_connection(reader, writer, index_page),
+        '', port
+    )
+
+async def start_single_port_server(port):
+    """Serve HTTP, the browser WebSocket and the TD WebSocket on one listener
+
+    Plain HTTP requests are answered from process_request before the
+    WebSocket handshake; upgrades are dispatched by path: /ws/browser for
+    browsers, / or /ws/td for TouchDesigner and other clients.
+    """
+    index_page = IndexPage(port, SINGLE_PORT_BROWSER_PATH)
+    
+    def process_request(path, request_headers):
+        route = urllib.parse.urlsplit(path).path
+        if request_headers.get('Upgrade', '').lower() != 'websocket':
+            status, headers, body = http_response('GET', path, request_headers, index_page)
+            print(f"[HTTP] GET {path} {status.value}")
+            return status, headers, body
+        if route != SINGLE_PORT_BROWSER_PATH and route not in SINGLE_PORT_TD_PATHS and route != PEER_PATH:
+            return HTTPStatus.NOT_FOUND, [('Content-Type', 'text/plain')], b'Unknown WebSocket endpoint'
+        return None
+    
+    async def dispatch(websocket, path):
+        if urllib.parse.urlsplit(path).path == SINGLE_PORT_BROWSER_PATH:
+            await handle_browser_websocket(websocket, path)
+        else:
+            await handle_td_websocket(websocket, path)
+    
+    return await websockets.serve(dispatch, "0.0.0.0", port, process_request=process_request, ping_interval=None)
+
+def start_server(port=80, websocket_port=8080, auto_open=True, td_port=8081, single_port=False):
+    """Start the HTTP server and the WebSocket bridge on one asyncio event loop"""
     local_ip = get_local_ip()
     hostname = get_local_hostname()
     
@@ -73,58 +313,56 @@ def start_server(port=80, websocket_port=8080, auto_open=True):
     print(f"Make sure your TouchDesigner WebSocket DAT is running on port {websocket_port}")
     print("=" * 60)
     
-    # Change to the directory containing the templates folder
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    print(f"Changing to directory: {current_dir}")
-    os.chdir(current_dir)
-    
-    # Create a custom handler that serves index.html from templates/
-    class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-        def do_GET(self):
-            print(f"HTTP GET request for: {self.path}")
-            if self.path == '/' or self.path == '/index.html':
-                # Serve the modified HTML with dynamic WebSocket port
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                
-                # Read the template file
-                try:
-                    with open('templates/index.html', 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    
-                    # Replace the WebSocket port placeholder with the actual port
-                    html_content = html_content.replace(
-                        "const WS_PORT = '8080';  // TouchDesigner WebSocket DAT port (direct connection)",
-                        f"const WS_PORT = '{websocket_port}';  // TouchDesigner WebSocket DAT port (direct connection)"
-                    )
-                    
-                    self.wfile.write(html_content.encode('utf-8'))
-                    print(f"Served index.html with WebSocket port {websocket_port}")
-                except Exception as e:
-                    print(f"Error serving index.html: {e}")
-                    self.send_error(500, f"Error loading index.html: {e}")
-                return
-            elif self.path == '/favicon.ico':
-                # Handle favicon request gracefully - return empty 204 response
-                self.send_response(204)  # No Content
-                self.end_headers()
-                print("Served empty favicon response")
-                return
-            else:
-                # For other files, use default behavior
-                return super().do_GET()
-        
-        def log_message(self, format, *args):
-            print(f"[{self.log_date_time_string()}] {format % args}")
+    async def bind_http(port):
+        """HTTP (or the single-port listener), moving up to a free port if its own port is taken"""
+        while True:
+            try:
+                if single_port:
+                    print(f"Creating single-port HTTP + WebSocket server on port {port}...")
+                    return port, await start_single_port_server(port)
+                print(f"Creating HTTP server on port {port}...")
+                return port, await start_http_server(port, websocket_port)
+            except OSError as e:
+                if not address_in_use(e):
+                    raise
+                print(f"Port {port} is already in use!")
+                port = find_available_port(port + 1)
+                while port is not None and not single_port and port in (websocket_port, td_port):
+                    port = find_available_port(port + 1)  # Free now, but the WebSocket servers are about to take it
+                if port is None:
+                    print("No available ports found!")
+                    return None, None
+                print(f"Trying port {port} instead...")
     
-    try:
-        print(f"Creating TCP server on port {port}...")
-        with socketserver.TCPServer(("", port), CustomHTTPRequestHandler) as httpd:
+    async def serve():
+        servers = []
+        try:
+            http_port, http_server = await bind_http(port)
+            if http_server is None:
+                return False
+            servers.append(http_server)
+            if not single_port:
+                # The WebSocket ports are what TouchDesigner and the page are configured with: don't move them
+                for name, ws_port, start in (
+                    ('Browser WebSocket', websocket_port, start_browser_websocket_server),
+                    ('TouchDesigner WebSocket', td_port, start_td_websocket_server),
+                ):
+                    try:
+                        servers.append(await start(ws_port))
+                    except OSError as e:
+                        if address_in_use(e):
+                            print(f"{name} port {ws_port} is already in use!")
+                        else:
+                            print(f"Error starting {name} server on port {ws_port}: {e}")
+                        return False
+            
             print(f"Server started successfully!")
-            print(f"  Local: http://localhost:{port}")
-            print(f"  Network: http://{local_ip}:{port}")
-            print(f"  WebSocket: TouchDesigner port {websocket_port}")
+            print(f"  Local: http://localhost:{http_port}")
+            print(f"  Network: http://{local_ip}:{http_port}")
+            if single_port:
+                print(f"  WebSocket: browsers ws://{local_ip}:{http_port}{SINGLE_PORT_BROWSER_PATH}, TouchDesigner port {http_port}")
+            else:
+                print(f"  WebSocket: TouchDesigner port {websocket_port}")
             print("Server is ready to accept connections")
             
             # Open browser after a short delay
@@ -132,129 +370,956 @@ def start_server(port=80, websocket_port=8080, auto_open=True):
                 def open_browser():
                     print("Opening browser in 1 second...")
                     time.sleep(1)
-                    print(f"Opening browser to: http://localhost:{port}")
-                    webbrowser.open(f'http://localhost:{port}')
+                    print(f"Opening browser to: http://localhost:{http_port}")
+                    webbrowser.open(f'http://localhost:{http_port}')
                 
                 browser_thread = threading.Thread(target=open_browser)
                 browser_thread.daemon = True
                 browser_thread.start()
             
             print("Server running... Press Ctrl+C to stop")
-            httpd.serve_forever()
+            start_loop_monitor()
+            start_state_persistence()
+            start_peer_links()
+            await asyncio.Future()  # Run forever
+        finally:
+            # Don't leave listeners that did bind behind when another one failed
+            for server in servers:
+                server.close()
+            await scene_store.close()
+    
+    try:
+        if run_event_loop(serve()) is False:
+            sys.exit(1)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except OSError as e:
-        if "Address already in use" in str(e):
-            print(f"Port {port} is already in use!")
-            alternative_port = find_available_port(port + 1)
-            if alternative_port:
-                print(f"Trying port {alternative_port} instead...")
-                start_server(alternative_port, websocket_port, auto_open)
-            else:
-                print("No available ports found!")
-        else:
-            print(f"Error starting server: {e}")
+        print(f"Error starting server: {e}")
+
+def address_in_use(error):
+    return error.errno in (errno.EADDRINUSE, getattr(errno, 'WSAEADDRINUSE', errno.EADDRINUSE))
 
 # WebSocket Bridge for TouchDesigner
 browser_clients = set()
 td_clients = {}  # Map websocket -> component_id
+component_sockets = {}  # Map component_id -> websocket (routing index kept alongside td_clients)
+td_registry = ()  # Immutable snapshot of td_clients items, iterated by broadcasters without td_lock
 component_states = {}  # Map component_id -> latest state
 info_only_clients = set()  # Set of websockets that only want updates on request
-td_lock = asyncio.Lock()
+patch_clients = set()  # Browsers that receive state_patch deltas instead of full state_update
+client_outboxes = {}  # Map websocket -> ClientOutbox
+pending_states = {}  # Map component_id -> (state, td websocket) waiting out the coalescing window
+pending_flushes = {}  # Map component_id -> scheduled flush (asyncio TimerHandle)
+offline_expiries = {}  # Map component_id -> scheduled removal of a disconnected component (TimerHandle)
+subscriptions = {}  # Map websocket -> SubscriptionGroup for clients that only want part of the state
+subscription_groups = {}  # Map subscription key -> SubscriptionGroup shared by all clients with that filter
+peer_links = {}  # Map websocket -> PeerLink for connections to other bridges
+worker_links = set()  # WorkerLinks of the browser worker processes (coordinator side)
+coordinator_link = None  # CoordinatorLink, set only inside a worker process
+remote_components = {}  # Map component_id -> websocket of the peer bridge that owns it
+td_lock = asyncio.Lock()  # Guards mutations of td_clients/component_sockets only, never held across I/O
+
+# Bridge tuning, overridden from the command line in main()
+bridge_config = {
+    'queue_high_water': 256,  # Frames queued for one client before it counts as a slow consumer
+    'slow_client_policy': 'resync',  # Slow browsers: 'resync' (drop backlog, send one snapshot) or 'disconnect'
+    'coalesce_ms': 10,  # Per-component window for merging bursts of state_update (0 disables)
+    'ping_interval': 10,  # Seconds between protocol-level pings to every client (0 disables)
+    'ping_timeout': 10,  # Seconds without a pong before a client counts as dead and is evicted
+    'offline_grace': 30,  # Seconds a disconnected component stays in the merged state as offline (0 removes it at once)
+    'state_file': None,  # Component state snapshot for warm restarts (None disables)
+    'state_interval': 5,  # Seconds between snapshots (only written when something changed)
+    'bridge_id': socket.gethostname(),  # Origin tag of this bridge's components on its peers
+    'peers': [],  # WebSocket URLs of peer bridges to connect to
+    'workers': 0,  # Worker processes serving the browser port (0: browsers are served by this process)
+    'loop': 'asyncio',  # Event loop implementation: 'asyncio' or 'uvloop' (if installed)
+    'lag_threshold_ms': 250,  # Loop stall that gets its stack sampled and logged (0 disables the lag monitor)
+}
+bridge_counters = {
+    'evicted_clients': 0,  # Slow consumers disconnected
+    'resynced_clients': 0,  # Slow browsers moved to snapshot-only resync
+    'coalesced_states': 0,  # state_update messages superseded inside a coalescing window
+    'rejected_messages': 0,  # Malformed frames and unknown actions answered with an error
+    'dead_peers': 0,  # Clients evicted for not answering a ping in time
+}
+action_stats = {}  # Map (client kind, action) -> ActionStats
+
+_RESYNC = object()  # Queue marker: send a fresh full snapshot when reached
+
+WIRE_ENCODINGS = ('json', 'msgpack') if msgpack else ('json',)
+
+def decode_message(message):
+    """Decode an incoming frame: text is JSON, binary is MessagePack
+
+    Raises ValueError for anything that doesn't decode to a JSON object.
+    """
+    if isinstance(message, (bytes, bytearray)):
+        if not msgpack:
+            raise ValueError('Binary message received but msgpack is not installed')
+        data = msgpack.unpackb(message, raw=False, strict_map_key=False)
+    else:
+        data = json.loads(message)
+    if not isinstance(data, dict):
+        raise ValueError('Message is not an object')
+    return data
+
+class Frame:
+    """One outgoing message, encoded at most once per wire encoding
+
+    A broadcast creates a single Frame and queues it for every client; each
+    writer asks for its client's encoding and the first one to do so pays
+    for the (trans)coding.
+    """
+
+    __slots__ = ('_payload', '_encoded')
+
+    def __init__(self, payload=None):
+        self._payload = payload
+        self._encoded = {}
+
+    @classmethod
+    def from_wire(cls, message):
+        """Wrap an already encoded message (JSON text or MessagePack bytes)"""
+        if isinstance(message, Frame):
+            return message
+        frame = cls()
+        frame._encoded['msgpack' if isinstance(message, (bytes, bytearray)) else 'json'] = message
+        return frame
+
+    @property
+    def payload(self):
+        if self._payload is None:
+            self._payload = decode_message(next(iter(self._encoded.values())))
+        return self._payload
+
+    def encoded(self, encoding):
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == 'msgpack':
+                data = msgpack.packb(self.payload, use_bin_type=True)
+            else:
+                data = json.dumps(self.payload)
+            self._encoded[encoding] = data
+        return data
+
+RTT_HISTOGRAM_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)  # Upper bucket bounds in milliseconds
+RTT_WINDOW = 32  # Pings kept per client for its rolling RTT histogram
+
+def rtt_summary(samples):
+    """Percentiles and a bucket histogram of delays in seconds (ping round trips, loop lag)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    histogram = [0] * (len(RTT_HISTOGRAM_MS) + 1)
+    for rtt in ordered:
+        histogram[bisect.bisect_left(RTT_HISTOGRAM_MS, rtt * 1000)] += 1
+    labels = [f'<={bound}ms' for bound in RTT_HISTOGRAM_MS] + [f'>{RTT_HISTOGRAM_MS[-1]}ms']
+    return {
+        'samples': len(ordered),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+        'histogram': dict(zip(labels, histogram)),
+    }
+
+LAG_WINDOW = 600  # Loop lag samples kept for the rolling histogram (a minute at the default interval)
+STALL_SAMPLES = 5  # Stack samples of the most recent event loop stalls kept for bridge_stats
+
+class LoopMonitor:
+    """Measure event loop scheduling lag, sample the loop's stack when it stalls
+
+    A callback scheduled every interval records how late it actually ran. A
+    watchdog thread checks that these ticks keep coming: once the loop has
+    gone longer than threshold without one, it records (and prints) the
+    stack the loop thread is executing, i.e. the code that blocks it.
+    """
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = collections.deque(maxlen=LAG_WINDOW)
+        self.stalls = collections.deque(maxlen=STALL_SAMPLES)
+        self.stall_count = 0
+        self.loop_name = None
+        self._loop = None
+        self._thread_id = None
+        self._last_tick = None
+        self._stall = None  # Stall the watchdog is currently seeing
+
+    def start(self):
+        loop = self._loop = asyncio.get_running_loop()
+        self.loop_name = f'{type(loop).__module__}.{type(loop).__name__}'
+        self._thread_id = threading.get_ident()
+        self._last_tick = time.perf_counter()
+        loop.call_later(self.interval, self._tick, loop, self._last_tick + self.interval)
+        threading.Thread(target=self._watchdog, name='loop-watchdog', daemon=True).start()
+
+    def _tick(self, loop, expected):
+        now = time.perf_counter()
+        self.lags.append(max(0.0, now - expected))
+        self._last_tick = now
+        stall, self._stall = self._stall, None
+        if stall:
+            stall['blocked_ms'] = round((now - stall['since']) * 1000, 1)
+            print(f"[Bridge] Event loop was blocked for {stall['blocked_ms']:g} ms")
+        loop.call_later(self.interval, self._tick, loop, now + self.interval)
+
+    def _watchdog(self):
+        limit = self.interval + self.threshold
+        while True:
+            time.sleep(self.threshold / 2)
+            if not self._loop.is_running():
+                return
+            last_tick = self._last_tick
+            if self._stall or time.perf_counter() - last_tick < limit:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                return  # Loop thread is gone
+            stack = [line.rstrip() for line in traceback.format_stack(frame)]
+            self._stall = {'at': time.time(), 'since': last_tick + self.interval, 'blocked_ms': None, 'stack': stack}
+            self.stalls.append(self._stall)
+            self.stall_count += 1
+            print(f"[Bridge] Event loop blocked for over {self.threshold * 1000:g} ms in:\n" + '\n'.join(stack[-6:]))
+
+    def stats(self):
+        return {
+            'loop': self.loop_name,
+            'lag': rtt_summary(self.lags),
+            'stalls': self.stall_count,
+            'recent_stalls': [
+                {key: value for key, value in stall.items() if key != 'since'} for stall in self.stalls
+            ],
+        }
+
+loop_monitor = None  # LoopMonitor of the running bridge
+
+def start_loop_monitor():
+    global loop_monitor
+    if bridge_config['lag_threshold_ms'] > 0:
+        loop_monitor = LoopMonitor(LOOP_LAG_INTERVAL, bridge_config['lag_threshold_ms'] / 1000)
+        loop_monitor.start()
+
+def run_event_loop(main):
+    """asyncio.run() on the event loop chosen with --loop"""
+    if bridge_config['loop'] == 'uvloop' and uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
+
+class ClientOutbox:
+    """Bounded outbound queue for one connection, drained by its own writer task
+
+    Broadcasters call send() with a pre-serialized frame and return immediately,
+    so one stalled client can't hold up the others or the TD sender. A client
+    whose backlog reaches the high-water mark is disconnected, or (browsers with
+    the 'resync' policy) has its backlog replaced by a single fresh snapshot.
+    """
+
+    def __init__(self, websocket, kind):
+        self.websocket = websocket
+        self.kind = kind  # 'browser' or 'td'
+        self.encoding = 'json'  # Wire encoding negotiated through register_client
+        self.queue = collections.deque()
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped_frames = 0
+        self.max_depth = 0
+        self.snapshot_only = False
+        self.closed = False
+        self.rtts = collections.deque(maxlen=RTT_WINDOW)  # Recent ping round-trip times in seconds
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+        self._pinger = asyncio.create_task(self._heartbeat()) if bridge_config['ping_interval'] > 0 else None
+
+    @property
+    def depth(self):
+        return len(self.queue)
+
+    def send(self, frame):
+        """Queue a frame without waiting for the network"""
+        if self.closed or self.snapshot_only:
+            self.dropped_frames += 1
+            return
+        if len(self.queue) >= bridge_config['queue_high_water']:
+            self._overflow()
+            return
+        self.queue.append(frame)
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._wakeup.set()
+
+    def _overflow(self):
+        self.dropped_frames += len(self.queue) + 1
+        self.queue.clear()
+        if self.kind == 'browser' and bridge_config['slow_client_policy'] == 'resync':
+            # Everything queued is superseded by one snapshot sent once the client catches up
+            print(f"[Bridge] Slow browser {self.websocket.remote_address}: backlog dropped, resyncing with a snapshot")
+            bridge_counters['resynced_clients'] += 1
+            self.snapshot_only = True
+            self.queue.append(_RESYNC)
+            self._wakeup.set()
+        else:
+            print(f"[Bridge] Slow {self.kind} client {self.websocket.remote_address}: disconnecting")
+            bridge_counters['evicted_clients'] += 1
+            self.closed = True
+            asyncio.create_task(self.websocket.close(code=1008, reason='Client too slow'))
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                frame = self.queue.popleft()
+                if frame is _RESYNC:
+                    frame = Frame.from_wire(state_snapshot_message(self.websocket))
+                    self.snapshot_only = False
+                data = frame.encoded(self.encoding)
+                await self.websocket.send(data)
+                self.sent_frames += 1
+                self.sent_bytes += len(data)
+        except websockets.exceptions.ConnectionClosed:
+            self.closed = True
+        except Exception as e:
+            print(f"[Bridge] Failed to send to {self.kind} client: {e}")
+            self.closed = True
+
+    async def _heartbeat(self):
+        """Ping the client every ping_interval, record the RTT, evict it if the pong doesn't come"""
+        interval, timeout = bridge_config['ping_interval'], bridge_config['ping_timeout']
+        while not self.closed:
+            await asyncio.sleep(interval)
+            sent_at = time.perf_counter()
+            try:
+                # Sending the ping can stall too when the peer stopped reading
+                await asyncio.wait_for(self._ping(), timeout)
+            except asyncio.TimeoutError:
+                self._evict_dead_peer(timeout)
+                return
+            except websockets.exceptions.ConnectionClosed:
+                return
+            self.rtts.append(time.perf_counter() - sent_at)
+
+    async def _ping(self):
+        pong_waiter = await self.websocket.ping()
+        await pong_waiter
+
+    def _evict_dead_peer(self, timeout):
+        print(f"[Bridge] No pong from {self.kind} client {self.websocket.remote_address} within {timeout:g} s: disconnecting")
+        bridge_counters['dead_peers'] += 1
+        # Stop queueing broadcasts for it right away, the close handshake may take a while
+        self.closed = True
+        self.queue.clear()
+        browser_clients.discard(self.websocket)
+        patch_clients.discard(self.websocket)
+        asyncio.create_task(self.websocket.close(code=1011, reason='Ping timeout'))
+
+    def stop(self):
+        self.closed = True
+        self._task.cancel()
+        if self._pinger:
+            self._pinger.cancel()
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'address': str(self.websocket.remote_address),
+            'encoding': self.encoding,
+            'depth': len(self.queue),
+            'max_depth': self.max_depth,
+            'sent_frames': self.sent_frames,
+            'sent_bytes': self.sent_bytes,
+            'dropped_frames': self.dropped_frames,
+            'snapshot_only': self.snapshot_only,
+            'rtt': rtt_summary(self.rtts),
+        }
+
+def _refresh_td_registry():
+    global td_registry
+    td_registry = tuple(td_clients.items())
+
+async def register_td_client(websocket):
+    """Add a TD connection (component_id is bound on its first state message)"""
+    async with td_lock:
+        td_clients[websocket] = None
+        _refresh_td_registry()
+
+async def bind_td_component(websocket, component_id):
+    """Map a TD connection to its component_id in both directions"""
+    if td_clients.get(websocket) == component_id and component_sockets.get(component_id) is websocket:
+        return
+    async with td_lock:
+        previous_id = td_clients.get(websocket)
+        if previous_id and component_sockets.get(previous_id) is websocket:
+            del component_sockets[previous_id]
+        td_clients[websocket] = component_id
+        # A reconnecting component takes over the index from its old socket
+        component_sockets[component_id] = websocket
+        _refresh_td_registry()
+
+async def unregister_td_client(websocket):
+    """Remove a TD connection
+
+    Returns its component_id if no newer connection owns that component.
+    """
+    async with td_lock:
+        component_id = td_clients.pop(websocket, None)
+        info_only_clients.discard(websocket)  # Remove from info-only set if present
+        _refresh_td_registry()
+        if component_id and component_sockets.get(component_id) is websocket:
+            del component_sockets[component_id]
+            return component_id
+        return None
+
+def component_socket(component_id):
+    """Where commands for a component go: its TD, or the peer bridge that owns it"""
+    return component_sockets.get(component_id) or remote_components.get(component_id)
+
+def open_outbox(websocket, kind):
+    outbox = ClientOutbox(websocket, kind)
+    client_outboxes[websocket] = outbox
+    return outbox
+
+def close_outbox(websocket):
+    outbox = client_outboxes.pop(websocket, None)
+    if outbox:
+        outbox.stop()
+
+def send_to(websocket, frame):
+    """Queue a frame (Frame, JSON text or MessagePack bytes) for one connection
+
+    No-op once the connection has gone away.
+    """
+    outbox = client_outboxes.get(websocket)
+    if outbox:
+        outbox.send(Frame.from_wire(frame))
+
+def negotiate_encoding(websocket, msg_data):
+    """Apply the 'encoding' requested in a register_client message
+
+    The bridge falls back to JSON when the encoding isn't available here and
+    confirms the choice with a client_registered message (in the new encoding).
+    """
+    requested = msg_data.get('encoding')
+    outbox = client_outboxes.get(websocket)
+    if not requested or not outbox:
+        return
+    outbox.encoding = requested if requested in WIRE_ENCODINGS else 'json'
+    print(f"[Bridge] Client {websocket.remote_address} uses {outbox.encoding} (requested {requested})")
+    send_to(websocket, Frame({'action': 'client_registered', 'encoding': outbox.encoding}))
+
+def bridge_stats():
+    """Queue depth and drop counters for every connection, per-action message stats"""
+    clients = [outbox.stats() for outbox in client_outboxes.values()]
+    return {
+        'browsers': len(browser_clients),
+        'td_clients': len(td_clients),
+        'components': len(component_states),
+        'remote_components': len(remote_components),
+        'peers': [link.stats() for link in peer_links.values()],
+        'workers': [link.stats() for link in worker_links],
+        'seq': state_engine.seq,
+        'event_loop': loop_monitor.stats() if loop_monitor else None,
+        'queued_frames': sum(c['depth'] for c in clients),
+        'dropped_frames': sum(c['dropped_frames'] for c in clients),
+        'rtt': {
+            kind: rtt_summary([rtt for outbox in client_outboxes.values() if outbox.kind == kind for rtt in outbox.rtts])
+            for kind in ('browser', 'td', 'peer')
+        },
+        **bridge_counters,
+        'subscriptions': [group.stats() for group in subscription_groups.values()],
+        'actions': {f'{kind}:{action}': stats.stats() for (kind, action), stats in sorted(action_stats.items())},
+        'clients': clients,
+    }
+
+# Message routing: each side of the bridge has a table of action -> Route.
+# Routes with header fields are dispatched on a peek at the raw JSON text and
+# forward the original frame; the rest get the fully decoded message.
+Route = collections.namedtuple('Route', 'handler fields')
+
+HEADER_PATTERNS = {
+    name: re.compile(r'"%s"\s*:\s*(?:"([^"\\]*)"|null)' % name)
+    for name in ('action', 'component_id')
+}
+PARSE_HISTOGRAM_US = (10, 50, 100, 500, 1000, 5000, 10000)  # Upper bucket bounds in microseconds
+
+def peek_header(message, fields=('action',)):
+    """Read top-level string fields of a JSON text frame without decoding it
+
+    Returns None when that can't be done safely (binary frame, field nested or
+    not a plain string...); the caller then decodes the whole message.
+    """
+    if not isinstance(message, str) or message[:1] != '{':
+        return None
+    header = {}
+    for name in fields:
+        match = HEADER_PATTERNS[name].search(message)
+        if match:
+            prefix = message[1:match.start()]
+            if '{' in prefix or '[' in prefix:
+                return None  # Possibly a nested object's field
+            header[name] = match.group(1)
+        elif f'"{name}"' in message:
+            return None  # Present but not a plain string, or nested
+        else:
+            header[name] = None
+    return header
+
+class ActionStats:
+    """Message count, size and parse/handling time for one action"""
+
+    __slots__ = ('count', 'peeked', 'bytes', 'parse_seconds', 'handle_seconds', 'parse_histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.peeked = 0  # Dispatched on the header peek, never fully decoded
+        self.bytes = 0
+        self.parse_seconds = 0.0
+        self.handle_seconds = 0.0
+        self.parse_histogram = [0] * (len(PARSE_HISTOGRAM_US) + 1)
+
+    def record(self, size, peeked, parse_seconds, handle_seconds):
+        self.count += 1
+        self.peeked += peeked
+        self.bytes += size
+        self.parse_seconds += parse_seconds
+        self.handle_seconds += handle_seconds
+        self.parse_histogram[bisect.bisect_left(PARSE_HISTOGRAM_US, parse_seconds * 1e6)] += 1
+
+    def stats(self):
+        labels = [f'<={bound}us' for bound in PARSE_HISTOGRAM_US] + [f'>{PARSE_HISTOGRAM_US[-1]}us']
+        return {
+            'count': self.count,
+            'peeked': self.peeked,
+            'bytes': self.bytes,
+            'parse_ms': round(self.parse_seconds * 1000, 3),
+            'handle_ms': round(self.handle_seconds * 1000, 3),
+            'parse_histogram': dict(zip(labels, self.parse_histogram)),
+        }
+
+def reject_message(websocket, kind, reason):
+    """Answer a frame the bridge won't route with an error, and drop it"""
+    bridge_counters['rejected_messages'] += 1
+    print(f"[Bridge] Rejected {kind} message: {reason}")
+    send_to(websocket, json.dumps({'action': 'error', 'message': reason}))
+
+async def dispatch_message(routes, kind, websocket, message):
+    """Run one incoming frame through an action table"""
+    started = time.perf_counter()
+    data = peek_header(message)
+    route = routes.get(data['action']) if data else None
+    if route and route.fields:
+        if route.fields != ('action',):
+            data = peek_header(message, route.fields)
+    else:
+        data = None
+    peeked = data is not None
+    if not peeked:
+        try:
+            data = decode_message(message)
+        except ValueError as e:
+            reject_message(websocket, kind, f'Malformed message: {e}')
+            return
+        # Both end up as dict keys and set members, so lists/objects must stop here
+        if not isinstance(data.get('action'), str):
+            reject_message(websocket, kind, 'Message action must be a string')
+            return
+        if not isinstance(data.get('component_id'), (str, type(None))):
+            reject_message(websocket, kind, 'component_id must be a string')
+            return
+        route = routes.get(data['action'])
+        if route is None:
+            reject_message(websocket, kind, f"Unknown action: {data['action']}")
+            return
+    parsed = time.perf_counter()
+    await route.handler(websocket, message, data)
+    key = (kind, data['action'])
+    stats = action_stats.get(key)
+    if stats is None:
+        stats = action_stats[key] = ActionStats()
+    stats.record(len(message), peeked, parsed - started, time.perf_counter() - parsed)
+
+async def send_bridge_stats(websocket, message, data):
+    send_to(websocket, json.dumps({'action': 'bridge_stats', 'stats': bridge_stats()}))
+
+class SceneStore:
+    """Named routing scenes covering every component, persisted as JSON lines
+
+    Each save or delete is applied in memory right away and appended to the
+    file afterwards on a worker thread (write-behind), so saving never waits
+    on the disk or on TouchDesigner. The file is replayed on open and
+    rewritten compactly once superseded records dominate it. close() writes
+    what is still pending on shutdown. Without a path scenes live in memory
+    only.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.scenes = {}  # Map name -> {'name', 'saved_at', 'components': {component_id: routing}}
+        self.records = 0  # Records in the file, live or superseded
+        self._pending = []
+        self._flush_task = None
+
+    def open(self, path):
+        """Replay the scenes file (a missing file is an empty store)"""
+        self.path = path
+        self.scenes = {}
+        self.records = 0
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line after a crash
+                    self.records += 1
+                    self._apply(record)
+        except FileNotFoundError:
+            pass
+        print(f"[Scenes] Loaded {len(self.scenes)} scenes from {path}")
+
+    def _apply(self, record):
+        if record.get('op') == 'delete':
+            self.scenes.pop(record.get('name'), None)
+        elif record.get('op') == 'save' and isinstance(record.get('scene'), dict):
+            self.scenes[record['name']] = record['scene']
+
+    def save(self, name, components):
+        scene = {'name': name, 'saved_at': time.time(), 'components': components}
+        self._write({'op': 'save', 'name': name, 'scene': scene})
+        return scene
+
+    def delete(self, name):
+        if name not in self.scenes:
+            return False
+        self._write({'op': 'delete', 'name': name})
+        return True
+
+    def summary(self):
+        """Scene names, save times and components, for scene lists in clients"""
+        return [
+            {'name': name, 'saved_at': scene['saved_at'], 'components': sorted(scene['components'])}
+            for name, scene in sorted(self.scenes.items())
+        ]
+
+    def _write(self, record):
+        self._apply(record)
+        if self.path is None:
+            return
+        self._pending.append(record)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending:
+            records, self._pending = self._pending, []
+            try:
+                if self.records + len(records) > 2 * len(self.scenes) + 64:
+                    # Scenes are never mutated once saved, the worker can serialize them safely
+                    snapshot = [{'op': 'save', 'name': name, 'scene': scene} for name, scene in self.scenes.items()]
+                    await asyncio.to_thread(self._rewrite, snapshot)
+                    self.records = len(snapshot)
+                else:
+                    await asyncio.to_thread(self._append, records)
+                    self.records += len(records)
+            except OSError as e:
+                print(f"[Scenes] Failed to write {self.path}: {e}")
+
+    async def close(self):
+        """Finish writing before the bridge exits, so every acknowledged save is on disk"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task  # Lets a write already on the worker thread finish first
+        if self._pending:
+            records, self._pending = self._pending, []
+            try:
+                self._append(records)
+                self.records += len(records)
+            except OSError as e:
+                print(f"[Scenes] Failed to write {self.path}: {e}")
+
+    def _append(self, records):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+
+    def _rewrite(self, records):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        os.replace(tmp_path, self.path)
+
+scene_store = SceneStore()
+
+def scene_name(websocket, data):
+    """The scene name of a scene command, or None after telling the sender it's missing"""
+    name = data.get('name')
+    if isinstance(name, str) and name.strip():
+        return name.strip()
+    send_to(websocket, json.dumps({'action': 'error', 'message': 'Scene name required'}))
+    return None
+
+def broadcast_scene_list():
+    message = Frame({'action': 'scenes', 'scenes': scene_store.summary()})
+    for browser in list(browser_clients):
+        send_to(browser, message)
+    broadcast_to_workers(message)
+
+async def save_scene(websocket, message, data):
+    """Capture every component's routing (sources, locks, placeholders) as a named scene"""
+    name = scene_name(websocket, data)
+    if name is None:
+        return
+    for component_id in list(pending_states):
+        flush_component_state(component_id)
+    components = {
+        component_id: {
+            'output_names': state.get('output_names', []),
+            'current_sources': state.get('current_sources', []),
+            'locks': state.get('locks', []),
+            'placeholders': state.get('placeholders', []),
+        }
+        for component_id, state in component_states.items()
+    }
+    scene_store.save(name, components)
+    print(f"[Scenes] Saved scene '{name}' ({len(components)} components)")
+    send_to(websocket, json.dumps({'action': 'scene_saved', 'name': name, 'components': sorted(components)}))
+    broadcast_scene_list()
+
+async def recall_scene(websocket, message, data):
+    """Send each connected component of a scene one set_sources batch"""
+    name = scene_name(websocket, data)
+    if name is None:
+        return
+    scene = scene_store.scenes.get(name)
+    if scene is None:
+        send_to(websocket, json.dumps({'action': 'error', 'message': f'Scene {name} not found'}))
+        return
+    recalled, missing, missing_outputs = [], [], {}
+    for component_id, routing in scene['components'].items():
+        target_socket = component_socket(component_id)
+        if not target_socket:
+            missing.append(component_id)
+            continue
+        locks = routing.get('locks', [])
+        placeholders = routing.get('placeholders', [])
+        saved_names = routing.get('output_names', [])
+        # Outputs are matched by name, so a scene survives outputs being added or reordered;
+        # outputs that were renamed or removed since are skipped rather than routed by position
+        current_blocks = {}
+        for block_idx, output_name in enumerate(component_states.get(component_id, {}).get('output_names', [])):
+            current_blocks.setdefault(output_name, []).append(block_idx)
+        routes = []
+        for saved_idx, source_name in enumerate(routing.get('current_sources', [])):
+            if not saved_names:
+                block_idx = saved_idx  # Scene without output names: positions are all there is
+            elif saved_idx < len(saved_names) and current_blocks.get(saved_names[saved_idx]):
+                block_idx = current_blocks[saved_names[saved_idx]].pop(0)  # Repeated names pair up in order
+            else:
+                missing_outputs.setdefault(component_id, []).append(saved_names[saved_idx] if saved_idx < len(saved_names) else f'#{saved_idx}')
+                continue
+            route = {'block_idx': block_idx, 'source_name': source_name}
+            if saved_idx < len(locks):
+                route['locked'] = locks[saved_idx]
+            if saved_idx < len(placeholders):
+                route['placeholder'] = placeholders[saved_idx]
+            routes.append(route)
+        send_to(target_socket, Frame({'action': 'set_sources', 'component_id': component_id, 'scene': name, 'routes': routes}))
+        recalled.append(component_id)
+    skipped = sum(len(names) for names in missing_outputs.values())
+    print(f"[Scenes] Recalled scene '{name}' on {len(recalled)} components ({len(missing)} not connected, {skipped} outputs gone)")
+    send_to(websocket, json.dumps({
+        'action': 'scene_recalled', 'name': name, 'components': recalled, 'missing': missing, 'missing_outputs': missing_outputs
+    }))
+
+async def delete_scene(websocket, message, data):
+    name = scene_name(websocket, data)
+    if name is None:
+        return
+    if scene_store.delete(name):
+        print(f"[Scenes] Deleted scene '{name}'")
+        broadcast_scene_list()
+    else:
+        send_to(websocket, json.dumps({'action': 'error', 'message': f'Scene {name} not found'}))
+
+async def list_scenes(websocket, message, data):
+    send_to(websocket, json.dumps({'action': 'scenes', 'scenes': scene_store.summary()}))
+
+async def subscribe_client(websocket, message, data):
+    """Restrict a client to some components and/or output-name globs (none: everything)"""
+    components = data.get('components') or []
+    outputs = data.get('outputs') or []
+    if not (is_string_list(components) and is_string_list(outputs)):
+        reject_message(websocket, client_outboxes[websocket].kind, 'subscribe needs lists of component ids and output globs')
+        return
+    unsubscribe_client(websocket)
+    if components or outputs:
+        key = (tuple(sorted(set(components))), tuple(sorted(set(outputs))))
+        group = subscription_groups.get(key)
+        if group is None:
+            group = subscription_groups[key] = SubscriptionGroup(key)
+        group.members.add(websocket)
+        subscriptions[websocket] = group
+        print(f"[Bridge] Client {websocket.remote_address} subscribed to components {list(key[0]) or 'all'}, outputs {list(key[1]) or 'all'}")
+    if isinstance(websocket, WorkerClient):
+        # Its worker stops sending it the unfiltered broadcasts
+        websocket.link.set_subscribed(websocket, websocket in subscriptions)
+    send_to(websocket, json.dumps({'action': 'subscribed', 'components': components, 'outputs': outputs}))
+    send_to(websocket, state_snapshot_message(websocket))
+
+SCENE_ROUTES = {
+    'save_scene': Route(save_scene, None),
+    'recall_scene': Route(recall_scene, None),
+    'delete_scene': Route(delete_scene, None),
+    'list_scenes': Route(list_scenes, ('action',)),
+}
+
+async def browser_error(websocket, message, data):
+    # Don't forward error messages back (prevents loops)
+    print(f"[Bridge] Ignoring error echo from browser")
+
+async def browser_register_client(websocket, message, data):
+    negotiate_encoding(websocket, data)
+    # Browsers opt into state_patch messages, everyone else keeps full state_update
+    if data.get('patches'):
+        patch_clients.add(websocket)
+        print(f"[Bridge] Registered browser with state patches (seq {state_engine.seq})")
+    else:
+        patch_clients.discard(websocket)
+    if component_states:
+        send_to(websocket, state_snapshot_message(websocket))
+
+async def browser_resync(websocket, message, data):
+    # Browser saw a seq gap, answer with a full snapshot
+    print(f"[Bridge] Browser resync from seq {data.get('seq')} to {state_engine.seq}")
+    send_to(websocket, state_snapshot_message(websocket))
+
+async def browser_to_component(websocket, message, data):
+    """Route a command to the component named in it (all TDs if none is named)"""
+    component_id = data.get('component_id')
+    if not component_id:
+        await browser_to_all_tds(websocket, message, data)
+        return
+    target_socket = component_socket(component_id)
+    if target_socket:
+        send_to(target_socket, message)
+        print(f"[Bridge] Routed {data['action']} to component {component_id}")
+    else:
+        print(f"[Bridge] Component {component_id} not found")
+        send_to(websocket, json.dumps({
+            'action': 'error',
+            'message': f'Component {component_id} not connected'
+        }))
+
+async def browser_set_sources(websocket, message, data):
+    """Split a set_sources batch into one set_sources command per component"""
+    entries = data.get('routes')
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        reject_message(websocket, 'browser', 'set_sources needs a list of routes')
+        return
+    if not all(isinstance(entry.get('component_id'), (str, type(None))) for entry in entries):
+        reject_message(websocket, 'browser', 'set_sources route component_id must be a string')
+        return
+    batches = {}
+    for entry in entries:
+        batches.setdefault(entry.get('component_id'), []).append(
+            {key: value for key, value in entry.items() if key != 'component_id'}
+        )
+    missing = []
+    for component_id, routes in batches.items():
+        if component_id is None:
+            # Routes without a component go to every TD, like set_source
+            await browser_to_all_tds(websocket, Frame({'action': 'set_sources', 'routes': routes}), data)
+            continue
+        target_socket = component_socket(component_id)
+        if target_socket:
+            send_to(target_socket, Frame({'action': 'set_sources', 'component_id': component_id, 'routes': routes}))
+        else:
+            missing.append(component_id)
+    print(f"[Bridge] Split set_sources batch of {len(entries)} routes over {len(batches)} components")
+    if missing:
+        send_to(websocket, json.dumps({
+            'action': 'error',
+            'message': f"Component{'s' if len(missing) > 1 else ''} {', '.join(map(str, missing))} not connected"
+        }))
+
+async def browser_to_all_tds(websocket, message, data):
+    registry = td_registry
+    if registry:
+        # Forward to all TD clients for general messages
+        frame = Frame.from_wire(message)
+        for td_socket, _ in registry:
+            send_to(td_socket, frame)
+    else:
+        print(f"[Bridge] ERROR: No TD clients connected")
+        send_to(websocket, json.dumps({
+            'action': 'error',
+            'message': 'TouchDesigner not connected'
+        }))
+
+BROWSER_ROUTES = {
+    'error': Route(browser_error, ('action',)),
+    'register_client': Route(browser_register_client, None),
+    'resync': Route(browser_resync, None),
+    'get_bridge_stats': Route(send_bridge_stats, ('action',)),
+    'request_state': Route(browser_to_all_tds, ('action',)),
+    'ping': Route(browser_to_all_tds, ('action',)),
+    'set_sources': Route(browser_set_sources, None),
+    'subscribe': Route(subscribe_client, None),
+    **SCENE_ROUTES,
+    **{action: Route(browser_to_component, ('action', 'component_id')) for action in (
+        'set_source', 'set_lock', 'set_lock_global', 'refresh_sources', 'save_configuration', 'recall_configuration'
+    )},
+}
+
+def request_td_states():
+    """Ask every TD client for a fresh state_update (a browser connected)"""
+    registry = td_registry
+    if registry:
+        request = json.dumps({'action': 'request_state'})
+        for td_socket, _ in registry:
+            send_to(td_socket, request)
+        print(f"[Bridge] Requested state from {len(registry)} TD clients for new browser")
+    return bool(registry)
 
 async def handle_browser_websocket(websocket, path):
     """Handle WebSocket connections from browsers"""
     client_addr = websocket.remote_address
     print(f"[Browser] Connected: {client_addr}")
+    open_outbox(websocket, 'browser')
     browser_clients.add(websocket)
     
     try:
         # Request initial state from all TD clients and send merged state
-        async with td_lock:
-            if td_clients:
-                # Request state from all TD clients
-                for td_socket in list(td_clients.keys()):
-                    try:
-                        await td_socket.send(json.dumps({'action': 'request_state'}))
-                    except:
-                        pass
-                print(f"[Bridge] Requested state from {len(td_clients)} TD clients for new browser")
-                
-                # Send currently merged state immediately
-                if component_states:
-                    merged_state = merge_component_states()
-                    await websocket.send(json.dumps({
-                        'action': 'state_update',
-                        'state': merged_state
-                    }))
+        if request_td_states():
+            # Send currently merged state immediately
+            if component_states:
+                send_to(websocket, state_snapshot_message(websocket))
         
         async for message in websocket:
             print(f"[Browser→TDs] {message[:100] if len(message) > 100 else message}")
-            
-            # Don't forward error messages back (prevents loops)
-            try:
-                msg_data = json.loads(message)
-                action = msg_data.get('action')
-                
-                if action == 'error':
-                    print(f"[Bridge] Ignoring error echo from browser")
-                    continue
-                    
-                # Route commands to specific component if component_id specified
-                if action in ['set_source', 'set_lock', 'set_lock_global', 'refresh_sources', 'save_configuration', 'recall_configuration']:
-                    component_id = msg_data.get('component_id')
-                    if component_id:
-                        # Send to specific component
-                        target_socket = None
-                        async with td_lock:
-                            for td_socket, cid in td_clients.items():
-                                if cid == component_id:
-                                    target_socket = td_socket
-                                    break
-                        
-                        if target_socket:
-                            try:
-                                await target_socket.send(message)
-                                print(f"[Bridge] Routed {action} to component {component_id}")
-                            except:
-                                print(f"[Bridge] Failed to send to component {component_id}")
-                        else:
-                            print(f"[Bridge] Component {component_id} not found")
-                            await websocket.send(json.dumps({
-                                'action': 'error',
-                                'message': f'Component {component_id} not connected'
-                            }))
-                        continue
-            except:
-                pass
-            
-            async with td_lock:
-                if td_clients:
-                    # Forward to all TD clients for general messages
-                    disconnected = []
-                    for td_socket in list(td_clients.keys()):
-                        try:
-                            await td_socket.send(message)
-                        except:
-                            print(f"[Bridge] Failed to send to TD client")
-                            disconnected.append(td_socket)
-                    for td_socket in disconnected:
-                        if td_socket in td_clients:
-                            del td_clients[td_socket]
-                else:
-                    print(f"[Bridge] ERROR: No TD clients connected")
-                    await websocket.send(json.dumps({
-                        'action': 'error',
-                        'message': 'TouchDesigner not connected'
-                    }))
+            await dispatch_message(BROWSER_ROUTES, 'browser', websocket, message)
     except websockets.exceptions.ConnectionClosed:
         print(f"[Browser] Disconnected: {client_addr}")
     finally:
         browser_clients.discard(websocket)
+        patch_clients.discard(websocket)
+        unsubscribe_client(websocket)
+        close_outbox(websocket)
 
-def merge_component_states():
-    """Merge states from all TD components into a single state"""
-    if not component_states:
+MERGED_LIST_FIELDS = (
+    'output_names',
+    'current_sources',
+    'regex_patterns',
+    'effective_regex_patterns',
+    'output_resolutions',
+    'locks',
+)
+
+def rebuild_merged_state(states):
+    """Merge states from all TD components into a single state (full rebuild)
+
+    Reference implementation kept for benchmarks and equivalence checks,
+    the bridge itself uses the incremental MergedState below.
+    """
+    if not states:
         return {}
     
     # Start with first component's state as base
@@ -271,7 +1336,7 @@ def merge_component_states():
         'last_update': time.time()
     }
     
-    for component_id, state in component_states.items():
+    for component_id, state in states.items():
         # Track which component each output belongs to
         num_outputs = len(state.get('output_names', []))
         
@@ -282,7 +1347,10 @@ def merge_component_states():
             'output_start_idx': len(merged['output_names']),
             'output_count': num_outputs,
             'lock_global': state.get('lock_global', False),
-            'local_only_sources': state.get('local_only_sources', [])  # Spout sources local to this machine
+            'local_only_sources': state.get('local_only_sources', []),  # Spout sources local to this machine
+            'online': state.get('online', True),  # False while disconnected (grace period) or stale
+            'stale': state.get('stale', False),  # Restored from the snapshot, not reconnected yet
+            'origin': state.get('origin')  # bridge_id of the peer bridge owning a remote component
         })
         
         # Append all outputs from this component
@@ -304,155 +1372,1241 @@ def merge_component_states():
     
     return merged
 
+class MergedState:
+    """Incrementally maintained merge of all component states
+
+    Produces exactly what rebuild_merged_state() produces, but an update only
+    re-splices the lists of the component that changed. Sources are deduped
+    through a refcount index (source -> number of components listing it), so
+    the combined source list is only touched when a component's sources change.
+    """
+
+    def __init__(self, states=None):
+        # component_id -> raw state, insertion order is the merge order
+        self.states = {} if states is None else states
+        self._slices = {}  # component_id -> {field: list}
+        self._fields = {field: [] for field in MERGED_LIST_FIELDS}
+        self._components = {}  # component_id -> entry for merged['components']
+        self._component_sources = {}  # component_id -> deduped sources in order
+        self._source_refs = {}  # source -> refcount across components
+        self._sources = []
+        self._sources_dirty = False
+        self._locked_components = set()
+        self.seq = 0  # Bumped every time a merged state is published
+        self.version = 0  # Bumped on every component change, published or not
+        self._published = {}
+        self._dirty = False
+        initial = list(self.states.items())
+        self.states.clear()
+        for component_id, state in initial:
+            self.update_component(component_id, state)
+
+    def has_source(self, source):
+        """O(1) membership check against the combined source list"""
+        return source in self._source_refs
+
+    def _offset(self, component_id, field):
+        offset = 0
+        for cid in self.states:
+            if cid == component_id:
+                break
+            offset += len(self._slices[cid][field])
+        return offset
+
+    def _update_output_offsets(self):
+        start = 0
+        for cid in self.states:
+            self._components[cid]['output_start_idx'] = start
+            start += len(self._slices[cid]['output_names'])
+
+    def update_component(self, component_id, state):
+        """Insert or replace one component's state"""
+        is_new = component_id not in self._slices
+        self._dirty = True
+        self.version += 1
+        self.states[component_id] = state
+        new_slice = {field: list(state.get(field, [])) for field in MERGED_LIST_FIELDS}
+
+        if is_new:
+            old_slice = None
+            for field in MERGED_LIST_FIELDS:
+                self._fields[field].extend(new_slice[field])
+        else:
+            old_slice = self._slices[component_id]
+            for field in MERGED_LIST_FIELDS:
+                if old_slice[field] == new_slice[field]:
+                    continue
+                start = self._offset(component_id, field)
+                self._fields[field][start:start + len(old_slice[field])] = new_slice[field]
+        self._slices[component_id] = new_slice
+
+        self._components[component_id] = {
+            'component_id': component_id,
+            'component_name': state.get('component_name', component_id),
+            'machine_id': state.get('machine_id', 'unknown'),  # Hostname for Spout source sharing
+            'output_start_idx': 0,
+            'output_count': len(new_slice['output_names']),
+            'lock_global': state.get('lock_global', False),
+            'local_only_sources': state.get('local_only_sources', []),  # Spout sources local to this machine
+            'online': state.get('online', True),  # False while disconnected (grace period) or stale
+            'stale': state.get('stale', False),  # Restored from the snapshot, not reconnected yet
+            'origin': state.get('origin')  # bridge_id of the peer bridge owning a remote component
+        }
+        if is_new or len(old_slice['output_names']) != len(new_slice['output_names']):
+            self._update_output_offsets()
+        else:
+            self._components[component_id]['output_start_idx'] = self._offset(component_id, 'output_names')
+
+        if state.get('lock_global'):
+            self._locked_components.add(component_id)
+        else:
+            self._locked_components.discard(component_id)
+
+        self._update_sources(component_id, list(dict.fromkeys(state.get('sources', []))))
+
+    def _update_sources(self, component_id, new_sources):
+        old_sources = self._component_sources.get(component_id, [])
+        if old_sources == new_sources and component_id in self._component_sources:
+            return
+        is_last = next(reversed(self.states)) == component_id
+        appended_only = new_sources[:len(old_sources)] == old_sources
+
+        for source in old_sources:
+            self._source_refs[source] -= 1
+            if not self._source_refs[source]:
+                del self._source_refs[source]
+        if is_last and appended_only and not self._sources_dirty:
+            # The last component only gained sources: anything not already
+            # listed goes to the end, nothing else can move
+            for source in new_sources[len(old_sources):]:
+                if source not in self._source_refs:
+                    self._sources.append(source)
+        else:
+            self._sources_dirty = True
+        for source in new_sources:
+            self._source_refs[source] = self._source_refs.get(source, 0) + 1
+        self._component_sources[component_id] = new_sources
+
+    def remove_component(self, component_id):
+        """Drop a component and splice its outputs out of the merged lists"""
+        if component_id not in self._slices:
+            self.states.pop(component_id, None)
+            return
+        self._dirty = True
+        self.version += 1
+        old_slice = self._slices[component_id]
+        for field in MERGED_LIST_FIELDS:
+            start = self._offset(component_id, field)
+            del self._fields[field][start:start + len(old_slice[field])]
+        for source in self._component_sources.pop(component_id):
+            self._source_refs[source] -= 1
+            if not self._source_refs[source]:
+                del self._source_refs[source]
+        self._sources_dirty = True
+        del self._slices[component_id]
+        del self._components[component_id]
+        del self.states[component_id]
+        self._locked_components.discard(component_id)
+        self._update_output_offsets()
+
+    def _rebuild_sources(self):
+        # Linear re-walk in component order, first occurrence wins
+        self._sources = list(dict.fromkeys(
+            source
+            for cid in self.states
+            for source in self._component_sources[cid]
+        ))
+        self._sources_dirty = False
+
+    def snapshot(self):
+        """Return the merged state, same layout as rebuild_merged_state()"""
+        if not self.states:
+            return {}
+        if self._sources_dirty:
+            self._rebuild_sources()
+        merged = {'components': [dict(self._components[cid]) for cid in self.states]}
+        for field in MERGED_LIST_FIELDS:
+            merged[field] = list(self._fields[field])
+        merged['sources'] = list(self._sources)
+        merged['lock_global'] = bool(self._locked_components)
+        merged['last_update'] = time.time()
+        return merged
+
+    def slice(self, components=None, output_filter=None, fields=None):
+        """Merged state of some components, outputs and/or fields only
+
+        Same layout as snapshot(), with output_start_idx/output_count relative
+        to the slice. Filtering outputs adds an 'output_blocks' list holding
+        each output's block index within its component, and sources only
+        lists the sources of the components in the slice. Fields that aren't
+        requested are never copied.
+        """
+        if not self.states:
+            return {}
+        list_fields = [field for field in MERGED_LIST_FIELDS if fields is None or field in fields]
+        wants = lambda field: fields is None or field in fields
+        merged = {}
+        if components is None and output_filter is None:
+            # Every output: copy the cached merged lists that were asked for
+            if wants('components'):
+                merged['components'] = [dict(self._components[cid]) for cid in self.states]
+            for field in list_fields:
+                merged[field] = list(self._fields[field])
+            if wants('sources'):
+                if self._sources_dirty:
+                    self._rebuild_sources()
+                merged['sources'] = list(self._sources)
+            if wants('lock_global'):
+                merged['lock_global'] = bool(self._locked_components)
+            merged['last_update'] = time.time()
+            return merged
+        entries = []
+        for field in list_fields:
+            merged[field] = []
+        output_blocks = []
+        sources = {}
+        lock_global = False
+        for cid in self.states:
+            if components is not None and cid not in components:
+                continue
+            component_slice = self._slices[cid]
+            names = component_slice['output_names']
+            if output_filter is None:
+                keep = range(len(names))
+            else:
+                keep = [idx for idx, name in enumerate(names) if output_filter(name)]
+                if not keep:
+                    continue
+            entries.append(dict(
+                self._components[cid],
+                output_start_idx=len(output_blocks),
+                output_count=len(keep)
+            ))
+            for field in list_fields:
+                values = component_slice[field]
+                merged[field].extend(values[idx] for idx in keep if idx < len(values))
+            output_blocks.extend(keep)
+            sources.update(dict.fromkeys(self._component_sources[cid]))
+            lock_global = lock_global or cid in self._locked_components
+        if wants('components'):
+            merged['components'] = entries
+        if output_filter is not None:
+            merged['output_blocks'] = output_blocks
+        if wants('sources'):
+            merged['sources'] = list(sources)
+        if wants('lock_global'):
+            merged['lock_global'] = lock_global
+        merged['last_update'] = time.time()
+        return merged
+
+    def publish(self):
+        """Snapshot, bump seq and diff against the previously published state
+
+        Returns (merged, base_seq, changes) where changes turns the state
+        published at base_seq into merged.
+        """
+        merged = self.snapshot()
+        changes = diff_states(self._published, merged)
+        base_seq = self.seq
+        self.seq += 1
+        self._published = merged
+        self._dirty = False
+        return merged, base_seq, changes
+
+    def current(self):
+        """Return (seq, merged) for full snapshots sent to a single client
+
+        Changes that were never broadcast (e.g. a removed component) are
+        published here so the seq always matches the state it labels.
+        """
+        if self._dirty or (self.states and not self._published):
+            self.publish()
+        return self.seq, self._published
+
+def diff_states(old, new):
+    """Compute the changes of a state_patch message turning old into new
+
+    Lists of equal length are patched per index ('items'), anything else is
+    replaced as a whole ('set'); keys missing from new are listed in 'unset'.
+    """
+    changes = {}
+    for key, value in new.items():
+        old_value = old.get(key)
+        if key in old and old_value == value:
+            continue
+        if (isinstance(value, list) and isinstance(old_value, list)
+                and len(value) == len(old_value)):
+            items = {idx: item for idx, (old_item, item) in enumerate(zip(old_value, value)) if old_item != item}
+            if len(items) * 2 <= len(value):
+                changes.setdefault('items', {})[key] = items
+                continue
+        changes.setdefault('set', {})[key] = value
+    unset = [key for key in old if key not in new]
+    if unset:
+        changes['unset'] = unset
+    return changes
+
+def apply_changes(state, changes):
+    """Inverse of diff_states(): the state that changes turn state into"""
+    state = dict(state)
+    state.update(changes.get('set', {}))
+    for key, items in changes.get('items', {}).items():
+        values = list(state[key])
+        for idx, item in items.items():
+            values[int(idx)] = item  # JSON turns the indices into strings
+        state[key] = values
+    for key in changes.get('unset', []):
+        state.pop(key, None)
+    return state
+
+state_engine = MergedState(component_states)
+
+def merge_component_states():
+    """Merge states from all TD components into a single state"""
+    return state_engine.snapshot()
+
+class SubscriptionGroup:
+    """All clients subscribed with the same filter
+
+    The group's slice is built, diffed and serialized once per broadcast and
+    shared by every member. Like the full merged state it is labelled with
+    the seq it was published at, so members' patches chain the same way.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.components = set(key[0]) if key[0] else None
+        self.output_filter = output_glob_filter(key[1])
+        self.members = set()
+        self.seq, _ = state_engine.current()
+        self.published = state_engine.slice(self.components, self.output_filter)
+        self._snapshot = None
+
+    def snapshot(self):
+        """The state_update frame for the slice as last published"""
+        if self._snapshot is None:
+            self._snapshot = Frame({'action': 'state_update', 'seq': self.seq, 'state': self.published})
+        return self._snapshot
+
+    def publish(self, sender=None):
+        """Send members the new slice (patch or full), if it changed at all"""
+        sliced = state_engine.slice(self.components, self.output_filter)
+        if strip_timestamp(sliced) == strip_timestamp(self.published):
+            return
+        changes = diff_states(self.published, sliced)
+        base_seq = self.seq
+        self.seq, self.published, self._snapshot = state_engine.seq, sliced, None
+        patch_message = Frame({'action': 'state_patch', 'seq': self.seq, 'base_seq': base_seq, 'changes': changes})
+        for member in list(self.members):
+            if member in browser_clients:
+                send_to(member, patch_message if member in patch_clients else self.snapshot())
+            elif member != sender and member not in info_only_clients:
+                send_to(member, self.snapshot())
+
+    def wants(self, frame, header):
+        """Whether a forwarded message (source_changed...) concerns this subscription"""
+        component_id = header.get('component_id') if header else frame.payload.get('component_id')
+        if component_id is None:
+            return True  # Not about one component
+        if self.components is not None and component_id not in self.components:
+            return False
+        if self.output_filter is None:
+            return True
+        payload = frame.payload
+        names = component_states.get(component_id, {}).get('output_names', [])
+        if payload.get('action') == 'source_changed':
+            blocks = [payload.get('block_idx')]
+        elif payload.get('action') == 'sources_changed':
+            blocks = [route.get('block_idx') for route in payload.get('routes', []) if isinstance(route, dict)]
+        else:
+            return True
+        return any(isinstance(idx, int) and 0 <= idx < len(names) and self.output_filter(names[idx]) for idx in blocks)
+
+    def stats(self):
+        return {
+            'components': list(self.key[0]),
+            'outputs': list(self.key[1]),
+            'members': len(self.members),
+            'seq': self.seq,
+        }
+
+def output_glob_filter(globs):
+    """Match output names case-insensitively against any of the globs (None: no globs)"""
+    if not globs:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(glob)})' for glob in globs), re.IGNORECASE).match
+
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def strip_timestamp(state):
+    return {key: value for key, value in state.items() if key != 'last_update'}
+
+def unsubscribe_client(websocket):
+    group = subscriptions.pop(websocket, None)
+    if group:
+        group.members.discard(websocket)
+        if not group.members:
+            del subscription_groups[group.key]
+
+def state_snapshot_message(websocket=None):
+    """Full state_update for a single client, labelled with the current seq
+
+    A subscribed client gets its subscription's slice instead. In a worker
+    process this is the last state the coordinator sent.
+    """
+    if coordinator_link is not None:
+        return coordinator_link.state_frame or Frame({'action': 'state_update', 'seq': 0, 'state': {}})
+    group = subscriptions.get(websocket)
+    if group:
+        return group.snapshot()
+    seq, merged = state_engine.current()
+    return json.dumps({
+        'action': 'state_update',
+        'seq': seq,
+        'state': merged
+    })
+
+def broadcast_merged_state(sender=None):
+    """Publish the merged state to browsers and auto-update TD clients
+
+    Browsers registered for patches get a state_patch holding only what changed
+    since base_seq; other browsers and TD clients get the full state_update.
+    Each frame is serialized once and queued, nothing here waits on the network.
+    """
+    merged, base_seq, changes = state_engine.publish()
+    merged_message = Frame({
+        'action': 'state_update',
+        'seq': state_engine.seq,
+        'state': merged
+    })
+    patch_message = Frame({
+        'action': 'state_patch',
+        'seq': state_engine.seq,
+        'base_seq': base_seq,
+        'changes': changes
+    })
+    
+    # Send merged state to all browsers (subscribers get their slice below)
+    for browser in list(browser_clients):
+        if browser not in subscriptions:
+            send_to(browser, patch_message if browser in patch_clients else merged_message)
+    
+    # Send to other TD clients ONLY if they want auto-updates
+    broadcast_count = 0
+    for td_socket, _ in td_registry:
+        if td_socket != sender and td_socket not in info_only_clients and td_socket not in subscriptions:
+            send_to(td_socket, merged_message)
+            broadcast_count += 1
+    
+    for group in list(subscription_groups.values()):
+        group.publish(sender)
+    
+    if worker_links:
+        # Serialized once here, the workers only pass the bytes on
+        full, patch = wire_bytes(merged_message), wire_bytes(patch_message)
+        for link in list(worker_links):
+            link.send_state(full, patch)
+    
+    for link in list(peer_links.values()):
+        link.sync()
+    
+    print(f"[Bridge] Broadcasted merged state seq {state_engine.seq} to {len(browser_clients)} browsers ({len(patch_clients)} as patch) and {broadcast_count} TD clients (auto-update)")
+
+def broadcast_message(message, sender=None, header=None):
+    """Queue a forwarded message for all browsers and other non-info TD clients
+
+    Subscribed clients only get it if it concerns their components/outputs,
+    decided once per subscription group.
+    """
+    message = Frame.from_wire(message)
+    wanted = {}
+    
+    def wants(websocket):
+        group = subscriptions.get(websocket)
+        if group is None:
+            return True
+        if group not in wanted:
+            wanted[group] = group.wants(message, header)
+        return wanted[group]
+    
+    for browser in list(browser_clients):
+        if wants(browser):
+            send_to(browser, message)
+    for td_socket, _ in td_registry:
+        if td_socket != sender and td_socket not in info_only_clients and wants(td_socket):
+            send_to(td_socket, message)
+    broadcast_to_workers(message)
+    for client in [client for client in subscriptions if isinstance(client, WorkerClient)]:
+        if wants(client):
+            send_to(client, message)
+
+def queue_component_state(component_id, state, websocket):
+    """Apply a component's state now, or hold it for the coalescing window
+
+    One TD frame can send several state_update messages (resolution x and y,
+    one per appeared source...). Within the window only the latest state is
+    kept and a single merged broadcast goes out when it closes.
+    """
+    window = bridge_config['coalesce_ms'] / 1000
+    if window <= 0:
+        state_engine.update_component(component_id, state)
+        broadcast_merged_state(websocket)
+        return
+    if component_id in pending_states:
+        bridge_counters['coalesced_states'] += 1
+    pending_states[component_id] = (state, websocket)
+    if component_id not in pending_flushes:
+        pending_flushes[component_id] = asyncio.get_running_loop().call_later(
+            window, flush_component_state, component_id
+        )
+
+def flush_component_state(component_id):
+    """Apply and broadcast a component's pending state right away (if any)"""
+    handle = pending_flushes.pop(component_id, None)
+    if handle:
+        handle.cancel()
+    pending = pending_states.pop(component_id, None)
+    if pending is None:
+        return
+    state, websocket = pending
+    state_engine.update_component(component_id, state)
+    print(f"[Bridge] Updated state for component '{component_id}'")
+    broadcast_merged_state(websocket)
+
+def discard_component_state(component_id):
+    """Forget a pending state of a component that went away"""
+    handle = pending_flushes.pop(component_id, None)
+    if handle:
+        handle.cancel()
+    return pending_states.pop(component_id, None)
+
+def component_disconnected(component_id):
+    """Keep a disconnected component in the merged state as offline for the grace period
+
+    Browsers only get a small patch flipping the component's online flag, and
+    another when it comes back, instead of its outputs vanishing and
+    reappearing. Without a grace period the component is removed at once.
+    """
+    pending = discard_component_state(component_id)
+    state = pending[0] if pending else component_states.get(component_id)
+    if state is None:
+        return
+    grace = bridge_config['offline_grace']
+    if grace <= 0:
+        state_engine.remove_component(component_id)
+        print(f"[Bridge] Removed component '{component_id}'")
+        return
+    state_engine.update_component(component_id, dict(state, online=False))
+    cancel_offline_expiry(component_id)
+    offline_expiries[component_id] = asyncio.get_running_loop().call_later(grace, expire_component, component_id, grace)
+    print(f"[Bridge] Component '{component_id}' offline, keeping it for {grace:g} s")
+    broadcast_merged_state()
+
+def cancel_offline_expiry(component_id):
+    handle = offline_expiries.pop(component_id, None)
+    if handle:
+        handle.cancel()
+
+def expire_component(component_id, grace):
+    """Remove a component whose grace period ran out without a reconnect"""
+    offline_expiries.pop(component_id, None)
+    if component_id in component_sockets or component_id in remote_components or component_id not in component_states:
+        return
+    state_engine.remove_component(component_id)
+    print(f"[Bridge] Removed component '{component_id}' (offline for {grace:g} s)")
+    broadcast_merged_state()
+
+async def td_register_client(websocket, message, data):
+    negotiate_encoding(websocket, data)
+    # Handle client registration (info-only clients, auto-update preference)
+    client_type = data.get('client_type', 'controller')
+    auto_update = data.get('auto_update', True)
+    
+    if client_type == 'info' and not auto_update:
+        info_only_clients.add(websocket)
+        print(f"[Bridge] Registered INFO client (auto-update OFF)")
+    else:
+        info_only_clients.discard(websocket)
+        print(f"[Bridge] Registered client (auto-update ON)")
+
+async def td_state_update(websocket, message, data):
+    # Extract and store component state
+    state = data.get('state')
+    component_id = state.get('component_id') if isinstance(state, dict) else None
+    if not component_id or not isinstance(component_id, str):
+        reject_message(websocket, 'td', 'state_update without state.component_id')
+        return
+    
+    # Update component_id mapping
+    await bind_td_component(websocket, component_id)
+    cancel_offline_expiry(component_id)
+    
+    # Store this component's state, merge and send to browsers (coalesced)
+    queue_component_state(component_id, state, websocket)
+
+async def td_request_state(websocket, message, data):
+    # Respond to explicit state request from any client
+    projection = {key: data[key] for key in ('fields', 'components', 'outputs') if data.get(key) is not None}
+    if projection:
+        send_projected_state(websocket, projection)
+        return
+    send_to(websocket, state_snapshot_message(websocket))
+    print(f"[Bridge] Sent state to requesting TD client")
+
+def send_projected_state(websocket, projection):
+    """Answer a request_state limited to some fields, components and/or output globs
+
+    Built straight from the merged-state cache, only the requested fields
+    are copied and serialized.
+    """
+    if not all(is_string_list(value) for value in projection.values()):
+        reject_message(websocket, 'td', 'request_state fields, components and outputs must be lists of strings')
+        return
+    seq, _ = state_engine.current()
+    components = projection.get('components')
+    state = state_engine.slice(
+        set(components) if components else None,
+        output_glob_filter(projection.get('outputs')),
+        set(projection['fields']) if projection.get('fields') else None
+    )
+    send_to(websocket, Frame({'action': 'state_update', 'seq': seq, 'state': state, 'projection': projection}))
+
+async def td_to_all(websocket, message, data):
+    """Forward a TD message unchanged to browsers and other auto-update TD clients"""
+    print(f"[TD→All] {message[:100] if len(message) > 100 else message}")
+    
+    # A coalesced state sent before this message (e.g. source_changed) must reach clients first
+    if td_clients.get(websocket):
+        flush_component_state(td_clients[websocket])
+    
+    # Broadcast to all browsers and to other TD clients (excluding sender and info-only clients)
+    frame = Frame.from_wire(message)
+    broadcast_message(frame, websocket, data)
+    # Browsers on peer bridges follow this bridge's components too
+    if data['action'] in PEER_NOTIFICATIONS:
+        for peer in list(peer_links):
+            send_to(peer, frame)
+
+TD_ROUTES = {
+    'register_client': Route(td_register_client, None),
+    'state_update': Route(td_state_update, None),
+    'request_state': Route(td_request_state, None),
+    'get_bridge_stats': Route(send_bridge_stats, ('action',)),
+    'subscribe': Route(subscribe_client, None),
+    **SCENE_ROUTES,
+    # Component notifications, plus commands from info clients that TD components act on
+    **{action: Route(td_to_all, ('action', 'component_id')) for action in (
+        'source_changed', 'sources_changed', 'configuration_saved', 'configuration_recalled', 'error', 'ping', 'pong',
+        'set_source', 'set_sources', 'set_lock', 'set_lock_global', 'refresh_sources', 'save_configuration', 'recall_configuration'
+    )},
+}
+
+class PeerLink:
+    """A connection to another bridge, in either direction
+
+    Both ends send each other the states of their own (local) components:
+    the full state the first time, then diff_states() changes against what
+    was sent before. Received components join the merged state tagged with
+    the peer's bridge_id as 'origin' and commands for them are forwarded to
+    the peer. Nothing received from a peer is passed on to other peers, so
+    every pair of bridges that should see each other needs a link.
+    """
+
+    def __init__(self, websocket, url=None):
+        self.websocket = websocket
+        self.url = url  # Set on the connecting side
+        self.bridge_id = None  # Known once the peer's peer_hello arrives
+        self.sent = {}  # component_id -> local state as last sent
+        self.received = {}  # component_id -> remote state as received (without origin)
+
+    def sync(self):
+        """Send the peer what changed in local components since the last sync"""
+        for component_id, state in list(component_states.items()):
+            if 'origin' in state:
+                continue
+            sent = self.sent.get(component_id)
+            if sent is state:
+                continue  # States are replaced, never mutated
+            if sent is None:
+                message = {'action': 'peer_state', 'component_id': component_id, 'state': state}
+            else:
+                changes = diff_states(sent, state)
+                if not changes:
+                    self.sent[component_id] = state
+                    continue
+                message = {'action': 'peer_state', 'component_id': component_id, 'changes': changes}
+            self.sent[component_id] = state
+            send_to(self.websocket, Frame(message))
+        for component_id in list(self.sent):
+            state = component_states.get(component_id)
+            if state is not None and 'origin' not in state:
+                continue
+            del self.sent[component_id]
+            send_to(self.websocket, Frame({'action': 'peer_remove', 'component_id': component_id}))
+
+    def drop(self):
+        """The link went down: its components go offline like a disconnected TD"""
+        for component_id in list(self.received):
+            if remote_components.get(component_id) is self.websocket:
+                del remote_components[component_id]
+                component_disconnected(component_id)
+        self.received.clear()
+
+    def stats(self):
+        return {
+            'bridge_id': self.bridge_id,
+            'url': self.url,
+            'address': str(self.websocket.remote_address),
+            'components': sorted(self.received),
+        }
+
+async def peer_hello(websocket, message, data):
+    link = peer_links[websocket]
+    if data.get('bridge_id') == bridge_config['bridge_id']:
+        print(f"[Peer] {websocket.remote_address} is this bridge, closing the link")
+        await websocket.close(1008, 'Connected to itself')
+        return
+    link.bridge_id = data.get('bridge_id')
+    print(f"[Peer] Linked with bridge '{link.bridge_id}' ({websocket.remote_address})")
+
+async def peer_state(websocket, message, data):
+    """A peer's component state, full or as changes to the previous one"""
+    link = peer_links[websocket]
+    component_id = data.get('component_id')
+    if not isinstance(component_id, str):
+        reject_message(websocket, 'peer', 'peer_state without component_id')
+        return
+    current = component_states.get(component_id)
+    if component_id in component_sockets or (current is not None and 'origin' not in current):
+        print(f"[Peer] Ignoring component '{component_id}' from '{link.bridge_id}', a local component has that id")
+        return
+    if 'state' in data:
+        state = data['state']
+    elif component_id in link.received:
+        state = apply_changes(link.received[component_id], data.get('changes', {}))
+    else:
+        reject_message(websocket, 'peer', f'peer_state changes for unknown component {component_id}')
+        return
+    if not isinstance(state, dict):
+        reject_message(websocket, 'peer', 'peer_state needs a state object')
+        return
+    link.received[component_id] = state
+    remote_components[component_id] = websocket
+    cancel_offline_expiry(component_id)
+    state_engine.update_component(component_id, dict(state, origin=link.bridge_id))
+    broadcast_merged_state()
+
+async def peer_remove(websocket, message, data):
+    link = peer_links[websocket]
+    component_id = data.get('component_id')
+    if link.received.pop(component_id, None) is None:
+        return
+    if remote_components.get(component_id) is websocket:
+        del remote_components[component_id]
+        state_engine.remove_component(component_id)
+        print(f"[Peer] Removed component '{component_id}' of '{link.bridge_id}'")
+        broadcast_merged_state()
+
+async def peer_to_component(websocket, message, data):
+    """A command from a peer's browser for one of this bridge's components"""
+    component_id = data.get('component_id')
+    target_socket = component_sockets.get(component_id)  # Never passed on to another peer
+    if target_socket:
+        send_to(target_socket, message)
+        print(f"[Peer] Routed {data['action']} to component {component_id}")
+    else:
+        send_to(websocket, json.dumps({'action': 'error', 'message': f'Component {component_id} not connected'}))
+
+async def peer_to_local(websocket, message, data):
+    """A notification from a peer's component, for this bridge's clients only"""
+    broadcast_message(message, None, data)
+
+async def peer_error(websocket, message, data):
+    print(f"[Peer] Error from '{peer_links[websocket].bridge_id}': {data.get('message')}")
+
+# TD notifications passed on to peer bridges
+PEER_NOTIFICATIONS = ('source_changed', 'sources_changed', 'configuration_saved', 'configuration_recalled')
+
+PEER_ROUTES = {
+    'peer_hello': Route(peer_hello, None),
+    'peer_state': Route(peer_state, None),
+    'peer_remove': Route(peer_remove, None),
+    'error': Route(peer_error, None),
+    **{action: Route(peer_to_component, ('action', 'component_id')) for action in (
+        'set_source', 'set_sources', 'set_lock', 'set_lock_global', 'refresh_sources', 'save_configuration', 'recall_configuration'
+    )},
+    **{action: Route(peer_to_local, ('action', 'component_id')) for action in PEER_NOTIFICATIONS},
+}
+
+async def handle_peer_websocket(websocket, url=None):
+    """Exchange component states and commands with another bridge"""
+    link = peer_links[websocket] = PeerLink(websocket, url)
+    open_outbox(websocket, 'peer')
+    send_to(websocket, Frame({'action': 'peer_hello', 'bridge_id': bridge_config['bridge_id']}))
+    link.sync()
+    try:
+        async for message in websocket:
+            await dispatch_message(PEER_ROUTES, 'peer', websocket, message)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        print(f"[Peer] Link with '{link.bridge_id}' closed")
+        del peer_links[websocket]
+        close_outbox(websocket)
+        link.drop()
+
+def peer_url(address):
+    """ws:// URL of a peer given as host:port (its TD port) or a full URL"""
+    if '://' not in address:
+        address = f'ws://{address}'
+    parts = urllib.parse.urlsplit(address)
+    return parts._replace(path=parts.path if parts.path not in ('', '/') else PEER_PATH).geturl()
+
+async def run_peer_link(url):
+    """Keep a link to a peer bridge up, reconnecting after failures"""
+    while True:
+        try:
+            async with websockets.connect(url, ping_interval=None, max_size=None) as websocket:
+                print(f"[Peer] Connected to {url}")
+                await handle_peer_websocket(websocket, url)
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            print(f"[Peer] Cannot reach {url}: {e}")
+        await asyncio.sleep(PEER_RETRY_DELAY)
+
+def start_peer_links():
+    return [asyncio.create_task(run_peer_link(peer_url(address))) for address in bridge_config['peers']]
+
 async def handle_td_websocket(websocket, path):
     """Handle WebSocket connection from TouchDesigner"""
+    if urllib.parse.urlsplit(path).path == PEER_PATH:
+        await handle_peer_websocket(websocket)
+        return
     client_addr = websocket.remote_address
     print(f"[TouchDesigner] Connected: {client_addr}")
     
     component_id = None
+    open_outbox(websocket, 'td')
     
-    async with td_lock:
-        # Initially register without component_id (will be updated on first state message)
-        td_clients[websocket] = None
-        print(f"[Bridge] TD client added. Total TD clients: {len(td_clients)}, Total browsers: {len(browser_clients)}")
+    # Initially register without component_id (will be updated on first state message)
+    await register_td_client(websocket)
+    print(f"[Bridge] TD client added. Total TD clients: {len(td_clients)}, Total browsers: {len(browser_clients)}")
     
     try:
         async for message in websocket:
-            # Parse message to check for state updates
-            try:
-                msg_data = json.loads(message)
-                action = msg_data.get('action')
-                
-                if action == 'register_client':
-                    # Handle client registration (info-only clients, auto-update preference)
-                    client_type = msg_data.get('client_type', 'controller')
-                    auto_update = msg_data.get('auto_update', True)
-                    
-                    if client_type == 'info' and not auto_update:
-                        info_only_clients.add(websocket)
-                        print(f"[Bridge] Registered INFO client (auto-update OFF)")
-                    else:
-                        info_only_clients.discard(websocket)
-                        print(f"[Bridge] Registered client (auto-update ON)")
-                    continue
-                
-                elif action == 'state_update':
-                    # Extract and store component state
-                    state = msg_data.get('state', {})
-                    component_id = state.get('component_id')
-                    
-                    if component_id:
-                        async with td_lock:
-                            # Update component_id mapping
-                            td_clients[websocket] = component_id
-                            # Store this component's state
-                            component_states[component_id] = state
-                            print(f"[Bridge] Updated state for component '{component_id}'")
-                        
-                        # Create merged state and send to browsers
-                        merged_state = merge_component_states()
-                        merged_message = json.dumps({
-                            'action': 'state_update',
-                            'state': merged_state
-                        })
-                        
-                        # Send merged state to all browsers
-                        disconnected_browsers = []
-                        for browser in list(browser_clients):
-                            try:
-                                await browser.send(merged_message)
-                            except Exception as e:
-                                print(f"[Bridge] Failed to send to browser: {e}")
-                                disconnected_browsers.append(browser)
-                        for browser in disconnected_browsers:
-                            browser_clients.discard(browser)
-                        
-                        # Send to other TD clients ONLY if they want auto-updates
-                        disconnected_tds = []
-                        broadcast_count = 0
-                        for td_socket, td_id in list(td_clients.items()):
-                            if td_socket != websocket and td_socket not in info_only_clients:
-                                try:
-                                    await td_socket.send(merged_message)
-                                    broadcast_count += 1
-                                except Exception as e:
-                                    print(f"[Bridge] Failed to send to TD client: {e}")
-                                    disconnected_tds.append(td_socket)
-                        for td_socket in disconnected_tds:
-                            if td_socket in td_clients:
-                                del td_clients[td_socket]
-                        
-                        print(f"[Bridge] Broadcasted merged state to {len(browser_clients)} browsers and {broadcast_count} TD clients (auto-update)")
-                        continue
-                
-                elif action == 'request_state':
-                    # Respond to explicit state request from any client
-                    merged_state = merge_component_states()
-                    response = json.dumps({
-                        'action': 'state_update',
-                        'state': merged_state
-                    })
-                    try:
-                        await websocket.send(response)
-                        print(f"[Bridge] Sent state to requesting TD client")
-                    except Exception as e:
-                        print(f"[Bridge] Failed to send state to TD client: {e}")
-                    continue
-                        
-            except json.JSONDecodeError:
-                pass
-            
-            # For non-state-update messages, broadcast as before
-            print(f"[TD→All] {message[:100] if len(message) > 100 else message}")
-            
-            # Broadcast to all browsers
-            disconnected_browsers = []
-            for browser in list(browser_clients):
-                try:
-                    await browser.send(message)
-                except Exception as e:
-                    print(f"[Bridge] Failed to send to browser: {e}")
-                    disconnected_browsers.append(browser)
-            for browser in disconnected_browsers:
-                browser_clients.discard(browser)
-            
-            # Also broadcast to other TD clients (excluding sender and info-only clients)
-            disconnected_tds = []
-            for td_socket in list(td_clients.keys()):
-                if td_socket != websocket and td_socket not in info_only_clients:
-                    try:
-                        await td_socket.send(message)
-                    except Exception as e:
-                        print(f"[Bridge] Failed to send to TD client: {e}")
-                        disconnected_tds.append(td_socket)
-            for td_socket in disconnected_tds:
-                if td_socket in td_clients:
-                    del td_clients[td_socket]
+            await dispatch_message(TD_ROUTES, 'td', websocket, message)
                 
     except websockets.exceptions.ConnectionClosed:
         print(f"[TouchDesigner] Disconnected: {client_addr}")
     finally:
-        async with td_lock:
-            if websocket in td_clients:
-                component_id = td_clients[websocket]
-                del td_clients[websocket]
-                info_only_clients.discard(websocket)  # Remove from info-only set if present
-                # Clean up component state
-                if component_id and component_id in component_states:
-                    del component_states[component_id]
-                    print(f"[Bridge] Removed component '{component_id}'")
-            print(f"[Bridge] TD client removed. Total TD clients: {len(td_clients)}")
+        component_id = await unregister_td_client(websocket)
+        # Mark the component offline (unless it already reconnected on a new socket)
+        if component_id:
+            component_disconnected(component_id)
+        print(f"[Bridge] TD client removed. Total TD clients: {len(td_clients)}")
+        unsubscribe_client(websocket)
+        close_outbox(websocket)
 
-async def run_websocket_servers(browser_port, td_port):
-    """Run both WebSocket servers"""
+# Multi-process mode (--workers): worker processes share the browser port
+# (SO_REUSEPORT) and serve the browsers, the coordinator (main process) keeps
+# the TD connections and all state. Every frame for browsers is serialized
+# once by the coordinator and sent to each worker over a local TCP
+# connection; workers send back the browser messages they can't answer.
+
+def write_ipc(writer, header, body=b''):
+    """Send one IPC message: a JSON header line, then size bytes of body
+
+    Broadcasts can't wait for the other process, so like a slow client's
+    outbox, a link whose write buffer passes IPC_HIGH_WATER is dropped: the
+    reading side sees it close and cleans up.
+    """
+    if writer.is_closing():
+        return
+    writer.write(json.dumps(dict(header, size=len(body))).encode('utf-8') + b'\n' + body)
+    if writer.transport.get_write_buffer_size() > IPC_HIGH_WATER:
+        print(f"[Bridge] IPC link to {writer.get_extra_info('peername')} is over {IPC_HIGH_WATER} bytes behind: closing it")
+        bridge_counters['evicted_clients'] += 1
+        writer.transport.abort()
+
+async def drain_ipc(writer):
+    """Wait until the link's write buffer is below the transport's limit"""
+    if not writer.is_closing():
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # The read side notices and cleans up
+
+async def read_ipc(reader):
+    line = await reader.readline()
+    if not line:
+        raise EOFError
+    header = json.loads(line)
+    body = await reader.readexactly(header['size']) if header['size'] else b''
+    return header, body
+
+def wire_bytes(frame):
+    """JSON encoding of a frame as bytes, for the IPC connection"""
+    return Frame.from_wire(frame).encoded('json').encode('utf-8')
+
+class WorkerClient:
+    """Coordinator-side stand-in for a browser connected to a worker
+
+    Handlers answer it like any browser: it is its own entry in
+    client_outboxes and hands frames to its worker for delivery.
+    """
+    kind = 'browser'
+    encoding = 'json'
+    rtts = ()
+
+    def __init__(self, link, client_id, address):
+        self.link = link
+        self.client_id = client_id
+        self.remote_address = address
+        self.sent_frames = 0
+
+    def send(self, frame):
+        self.sent_frames += 1
+        write_ipc(self.link.writer, {'op': 'reply', 'client': self.client_id}, wire_bytes(frame))
+
+    def stop(self):
+        pass
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'address': str(self.remote_address),
+            'worker': self.link.index,
+            'depth': 0,
+            'sent_frames': self.sent_frames,
+            'dropped_frames': 0,
+        }
+
+class WorkerLink:
+    """The coordinator's connection to one worker process"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.index = None  # Known once the worker's hello arrives
+        self.clients = {}  # client id -> WorkerClient
+
+    def send_state(self, full, patch=None):
+        """New merged state: stored by the worker and, with a patch, sent to its browsers"""
+        write_ipc(self.writer, {'op': 'state', 'split': len(full), 'broadcast': patch is not None}, full + (patch or b''))
+
+    def set_subscribed(self, client, subscribed):
+        write_ipc(self.writer, {'op': 'subscribed', 'client': client.client_id, 'subscribed': subscribed})
+
+    def open_client(self, client_id, address):
+        client = self.clients[client_id] = WorkerClient(self, client_id, address)
+        client_outboxes[client] = client
+        request_td_states()
+
+    def close_client(self, client_id):
+        client = self.clients.pop(client_id, None)
+        if client:
+            unsubscribe_client(client)
+            client_outboxes.pop(client, None)
+
+    def stats(self):
+        return {
+            'worker': self.index,
+            'browsers': len(self.clients),
+            'buffered_bytes': self.writer.transport.get_write_buffer_size(),
+        }
+
+def broadcast_to_workers(message):
+    if worker_links:
+        body = wire_bytes(message)
+        for link in list(worker_links):
+            write_ipc(link.writer, {'op': 'broadcast'}, body)
+
+async def handle_worker_link(reader, writer, token):
+    """Serve one worker process: its browsers' messages in, frames for them out"""
+    link = WorkerLink(reader, writer)
+    try:
+        header, _ = await read_ipc(reader)
+        if header.get('op') != 'hello' or header.get('token') != token:
+            print(f"[Bridge] Rejected worker connection from {writer.get_extra_info('peername')}")
+            return
+        link.index = header['worker']
+        worker_links.add(link)
+        if component_states:
+            link.send_state(wire_bytes(state_snapshot_message()))
+        print(f"[Bridge] Worker {link.index} connected")
+        while True:
+            header, body = await read_ipc(reader)
+            op = header['op']
+            if op == 'message':
+                client = link.clients.get(header['client'])
+                if client:
+                    message = body if header.get('binary') else body.decode('utf-8')
+                    await dispatch_message(BROWSER_ROUTES, 'browser', client, message)
+            elif op == 'open':
+                link.open_client(header['client'], header.get('address'))
+            elif op == 'close':
+                link.close_client(header['client'])
+            await drain_ipc(writer)  # Replies to this worker's browsers are flowing before reading more
+    except (EOFError, asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+        print(f"[Bridge] Worker {link.index} disconnected: {e!r}")
+    finally:
+        worker_links.discard(link)
+        for client_id in list(link.clients):
+            link.close_client(client_id)
+        writer.close()
+
+async def start_browser_workers(browser_port, count):
+    """Start the worker processes that serve the browser port"""
+    token = secrets.token_hex(16)  # Only our own workers may attach to the IPC port
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_worker_link(reader, writer, token), '127.0.0.1', 0
+    )
+    ipc_port = server.sockets[0].getsockname()[1]
+    context = multiprocessing.get_context('spawn')  # Forking a threaded process isn't safe
+    for index in range(count):
+        context.Process(
+            target=run_worker,
+            args=(index, browser_port, ipc_port, token, dict(bridge_config)),
+            name=f'bridge-worker-{index}',
+            daemon=True
+        ).start()
+    print(f"[WebSocket] Started {count} browser worker processes on port {browser_port}")
+    return server
+
+class CoordinatorLink:
+    """A worker's connection to the coordinator"""
+
+    def __init__(self, index, reader, writer):
+        self.index = index
+        self.reader = reader
+        self.writer = writer
+        self.clients = {}  # client id -> browser websocket
+        self.ids = {}  # browser websocket -> client id
+        self.subscribed = set()  # Browsers the coordinator sends filtered frames itself
+        self.state_frame = None  # Latest full state_update, for new and resyncing browsers
+        self._next_id = 0
+
+    def open(self, websocket):
+        self._next_id += 1
+        self.clients[self._next_id] = websocket
+        self.ids[websocket] = self._next_id
+        write_ipc(self.writer, {'op': 'open', 'client': self._next_id, 'address': str(websocket.remote_address)})
+
+    def close(self, websocket):
+        client_id = self.ids.pop(websocket, None)
+        if client_id is not None:
+            del self.clients[client_id]
+            self.subscribed.discard(websocket)
+            write_ipc(self.writer, {'op': 'close', 'client': client_id})
+
+    def forward(self, websocket, message):
+        binary = isinstance(message, (bytes, bytearray))
+        write_ipc(self.writer, {'op': 'message', 'client': self.ids[websocket], 'binary': binary},
+                  bytes(message) if binary else message.encode('utf-8'))
+
+    def _broadcast(self, frame, patch=None):
+        for browser in list(browser_clients):
+            if browser not in self.subscribed:
+                send_to(browser, patch if patch and browser in patch_clients else frame)
+
+    async def run(self):
+        """Deliver what the coordinator sends until it goes away"""
+        while True:
+            header, body = await read_ipc(self.reader)
+            op = header['op']
+            if op == 'state':
+                split = header['split']
+                self.state_frame = Frame.from_wire(body[:split].decode('utf-8'))
+                if header['broadcast']:
+                    self._broadcast(self.state_frame, Frame.from_wire(body[split:].decode('utf-8')))
+            elif op == 'broadcast':
+                self._broadcast(Frame.from_wire(body.decode('utf-8')))
+            elif op == 'reply':
+                websocket = self.clients.get(header['client'])
+                if websocket:
+                    send_to(websocket, Frame.from_wire(body.decode('utf-8')))
+            elif op == 'subscribed':
+                websocket = self.clients.get(header['client'])
+                if websocket and header['subscribed']:
+                    self.subscribed.add(websocket)
+                elif websocket:
+                    self.subscribed.discard(websocket)
+
+async def worker_forward(websocket, message, data):
+    coordinator_link.forward(websocket, message)
+    await drain_ipc(coordinator_link.writer)  # Stop reading this browser while the coordinator is behind
+
+async def worker_register_client(websocket, message, data):
+    if websocket in coordinator_link.subscribed:
+        coordinator_link.forward(websocket, message)  # Needs its slice from the coordinator
+        return
+    negotiate_encoding(websocket, data)
+    if data.get('patches'):
+        patch_clients.add(websocket)
+    else:
+        patch_clients.discard(websocket)
+    if coordinator_link.state_frame:
+        send_to(websocket, coordinator_link.state_frame)
+
+async def worker_resync(websocket, message, data):
+    if websocket in coordinator_link.subscribed:
+        coordinator_link.forward(websocket, message)
+    elif coordinator_link.state_frame:
+        send_to(websocket, coordinator_link.state_frame)
+
+# Workers answer registration and resyncs from the state they hold, everything else goes to the coordinator
+WORKER_ROUTES = {
+    **{action: Route(worker_forward, ('action',)) for action in BROWSER_ROUTES},
+    'register_client': Route(worker_register_client, None),
+    'resync': Route(worker_resync, None),
+}
+
+async def handle_worker_browser(websocket, path):
+    """Handle a browser connection inside a worker process"""
+    client_addr = websocket.remote_address
+    print(f"[Worker {coordinator_link.index}] Browser connected: {client_addr}")
+    open_outbox(websocket, 'browser')
+    browser_clients.add(websocket)
+    coordinator_link.open(websocket)
+    if coordinator_link.state_frame:
+        send_to(websocket, coordinator_link.state_frame)
+    try:
+        async for message in websocket:
+            await dispatch_message(WORKER_ROUTES, 'browser', websocket, message)
+    except websockets.exceptions.ConnectionClosed:
+        print(f"[Worker {coordinator_link.index}] Browser disconnected: {client_addr}")
+    finally:
+        browser_clients.discard(websocket)
+        patch_clients.discard(websocket)
+        coordinator_link.close(websocket)
+        close_outbox(websocket)
+
+async def worker_main(index, browser_port, ipc_port, token):
+    global coordinator_link
+    reader, writer = await asyncio.open_connection('127.0.0.1', ipc_port)
+    coordinator_link = CoordinatorLink(index, reader, writer)
+    write_ipc(writer, {'op': 'hello', 'worker': index, 'token': token})
+    start_loop_monitor()
+    await websockets.serve(handle_worker_browser, "0.0.0.0", browser_port, reuse_port=True, ping_interval=None)
+    print(f"[Worker {index}] Serving browsers on port {browser_port} (pid {os.getpid()})")
+    try:
+        await coordinator_link.run()
+    except (EOFError, asyncio.IncompleteReadError, ConnectionError):
+        print(f"[Worker {index}] Coordinator gone, exiting")
+
+def run_worker(index, browser_port, ipc_port, token, config):
+    """Entry point of a browser worker process"""
+    bridge_config.update(config)
+    try:
+        run_event_loop(worker_main(index, browser_port, ipc_port, token))
+    except KeyboardInterrupt:
+        pass
+
+def load_state_snapshot(path):
+    """Restore component states saved by a previous bridge run, marked stale
+
+    Browsers get the last known routing right away; each component's entry is
+    replaced by its live state when it reconnects. Returns the restored IDs.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"[Bridge] Ignoring unreadable state snapshot {path}: {e}")
+        return []
+    oldest = time.time() - STATE_SNAPSHOT_MAX_AGE
+    restored = []
+    for component_id, state in snapshot.get('components', {}).items():
+        if component_id in component_states or not isinstance(state, dict):
+            continue
+        if state.get('last_update', snapshot.get('saved_at', 0)) < oldest:
+            continue
+        state_engine.update_component(component_id, dict(state, stale=True, online=False))
+        restored.append(component_id)
+    print(f"[Bridge] Restored {len(restored)} components from {path} (stale until they reconnect)")
+    return restored
+
+def local_component_states():
+    """Component states owned by this bridge (remote ones come back from their peers)"""
+    return {cid: state for cid, state in component_states.items() if 'origin' not in state}
+
+def write_state_snapshot(path, components):
+    """Write the snapshot atomically: a reader sees the old file or the new one"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'saved_at': time.time(), 'components': components}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+async def run_state_snapshots(path, interval):
+    """Snapshot component states every interval seconds if they changed, and on shutdown"""
+    written_version = state_engine.version
+    write, write_version = None, None
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            if state_engine.version == written_version:
+                continue
+            write_version = state_engine.version
+            # States are replaced, never mutated, so the worker can serialize this copy
+            components = local_component_states()
+            write = asyncio.ensure_future(asyncio.to_thread(write_state_snapshot, path, components))
+            try:
+                # Shielded: on shutdown the finally below waits for the thread instead of racing it
+                await asyncio.shield(write)
+                written_version = write_version
+            except OSError as e:
+                print(f"[Bridge] Failed to write state snapshot {path}: {e}")
+    finally:
+        if write is not None and not write.done():
+            try:
+                await write
+                written_version = write_version
+            except OSError as e:
+                print(f"[Bridge] Failed to write state snapshot {path}: {e}")
+        if state_engine.version != written_version:
+            try:
+                write_state_snapshot(path, local_component_states())
+                print(f"[Bridge] Saved state snapshot to {path}")
+            except OSError as e:
+                print(f"[Bridge] Failed to write state snapshot {path}: {e}")
+
+def start_state_persistence():
+    """Load the warm-restart snapshot and keep it up to date (if a state file is configured)"""
+    path = bridge_config['state_file']
+    if not path:
+        return None
+    loop = asyncio.get_running_loop()
+    for component_id in load_state_snapshot(path):
+        # Components renamed or removed from the show since would otherwise stay "reconnecting" for good
+        offline_expiries[component_id] = loop.call_later(STATE_RESTORE_GRACE, expire_component, component_id, STATE_RESTORE_GRACE)
+    return asyncio.create_task(run_state_snapshots(path, bridge_config['state_interval']))
+
+async def start_browser_websocket_server(browser_port):
     print(f"[WebSocket] Starting browser WebSocket on port {browser_port}")
+    # Keepalive pings are sent by each ClientOutbox, which also measures RTT
+    if bridge_config['workers']:
+        return await start_browser_workers(browser_port, bridge_config['workers'])
+    return await websockets.serve(handle_browser_websocket, "0.0.0.0", browser_port, ping_interval=None)
+
+async def start_td_websocket_server(td_port):
     print(f"[WebSocket] Starting TD WebSocket on port {td_port}")
-    
-    browser_server = await websockets.serve(handle_browser_websocket, "0.0.0.0", browser_port)
-    td_server = await websockets.serve(handle_td_websocket, "0.0.0.0", td_port)
-    
-    print(f"[WebSocket] Servers ready!")
-    await asyncio.Future()  # Run forever
+    return await websockets.serve(handle_td_websocket, "0.0.0.0", td_port, ping_interval=None)
+
+async def run_websocket_servers(browser_port, td_port):
+    """Run both WebSocket servers without HTTP, as the benchmarks do"""
+    start_loop_monitor()
+    start_state_persistence()
+    start_peer_links()
+    servers = [await start_browser_websocket_server(browser_port), await start_td_websocket_server(td_port)]
+    print("[WebSocket] Servers ready!")
+    try:
+        await asyncio.Future()  # Run forever
+    finally:
+        for server in servers:
+            server.close()
+        await scene_store.close()
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -496,6 +2650,25 @@ TouchDesigner Setup:
         help='Port number for TouchDesigner to connect to (default: 8081)'
     )
     
+    parser.add_argument(
+        '--single-port',
+        action='store_true',
+        help='Serve HTTP, browser WebSocket (/ws/browser) and TD WebSocket (/ or /ws/td) all on --port'
+    )
+    
+    parser.add_argument(
+        '--coalesce-ms',
+        type=float,
+        default=10,
+        help='Window in ms for merging bursts of state updates from one component into one broadcast (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--no-coalesce',
+        action='store_true',
+        help='Broadcast every state update immediately (same as --coalesce-ms 0)'
+    )
+    
     parser.add_argument(
         '--no-browser',
         action='store_true',
@@ -508,6 +2681,94 @@ TouchDesigner Setup:
         help='Automatically find an available port if the specified HTTP port is in use'
     )
     
+    parser.add_argument(
+        '--ping-interval',
+        type=float,
+        default=10,
+        help='Seconds between WebSocket pings to every client, 0 disables (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--ping-timeout',
+        type=float,
+        default=10,
+        help='Seconds to wait for a pong before disconnecting a client (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--offline-grace',
+        type=float,
+        default=30,
+        help='Seconds a disconnected TD component stays visible as offline before it is removed, 0 removes it at once (default: 30)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Serve browsers from this many worker processes sharing the browser port, needs SO_REUSEPORT (default: 0, off)'
+    )
+    
+    parser.add_argument(
+        '--loop',
+        choices=['asyncio', 'uvloop'],
+        default='asyncio',
+        help='Event loop implementation; uvloop needs "pip install uvloop" and falls back to asyncio without it (default: asyncio)'
+    )
+    
+    parser.add_argument(
+        '--lag-threshold-ms',
+        type=float,
+        default=250,
+        help='Log the stack of anything blocking the event loop for longer than this, 0 disables the lag monitor (default: 250)'
+    )
+    
+    parser.add_argument(
+        '--peer',
+        action='append',
+        default=[],
+        metavar='HOST:PORT',
+        help='Link with another bridge (its TD port, or a ws:// URL) and share components with it; repeat for several peers'
+    )
+    
+    parser.add_argument(
+        '--bridge-id',
+        help='Name of this bridge shown on its peers (default: hostname:TD port)'
+    )
+    
+    parser.add_argument(
+        '--scenes-file',
+        default=SCENES_FILE,
+        help='File the bridge keeps routing scenes in (default: scenes.jsonl next to this script)'
+    )
+    
+    parser.add_argument(
+        '--state-file',
+        default=STATE_FILE,
+        help='File for warm-restart snapshots of component state, "" to disable (default: bridge_state.json next to this script)'
+    )
+    
+    parser.add_argument(
+        '--state-interval',
+        type=float,
+        default=5,
+        help='Seconds between component state snapshots (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--queue-high-water',
+        type=int,
+        default=256,
+        help='Frames queued for one client before it is treated as a slow consumer (default: 256)'
+    )
+    
+    parser.add_argument(
+        '--slow-client-policy',
+        choices=['resync', 'disconnect'],
+        default='resync',
+        help='What to do with slow browsers: drop their backlog and resync with one snapshot, or disconnect them (default: resync)'
+    )
+    
     return parser.parse_args()
 
 def main():
@@ -519,13 +2780,36 @@ def main():
     print("HTTP + WebSocket Bridge Server")
     print("=" * 60)
     
-    # Start WebSocket servers in background thread
-    def run_ws_servers():
-        asyncio.run(run_websocket_servers(args.websocket_port, args.td_port))
-    
-    ws_thread = threading.Thread(target=run_ws_servers, daemon=True)
-    ws_thread.start()
-    time.sleep(0.5)  # Let WebSocket servers start
+    bridge_config.update(
+        queue_high_water=args.queue_high_water,
+        slow_client_policy=args.slow_client_policy,
+        coalesce_ms=0 if args.no_coalesce else args.coalesce_ms,
+        ping_interval=args.ping_interval,
+        ping_timeout=args.ping_timeout,
+        offline_grace=args.offline_grace,
+        state_file=args.state_file or None,
+        state_interval=args.state_interval,
+        peers=args.peer,
+        workers=args.workers,
+        loop=args.loop,
+        lag_threshold_ms=args.lag_threshold_ms,
+    )
+    if args.loop == 'uvloop' and uvloop is None:
+        print("Warning: uvloop is not installed (pip install uvloop), using the asyncio event loop")
+        bridge_config['loop'] = 'asyncio'
+    if args.workers and args.single_port:
+        print("Warning: --workers needs a separate browser port, ignored in single-port mode")
+        bridge_config['workers'] = 0
+    elif args.workers and not hasattr(socket, 'SO_REUSEPORT'):
+        print("Warning: --workers needs SO_REUSEPORT, not available on this platform; serving browsers from one process")
+        bridge_config['workers'] = 0
+    if is_served(args.scenes_file):
+        print(f"Error: --scenes-file {args.scenes_file} is inside {STATIC_DIR}, which is served over HTTP")
+        return
+    if args.state_file and is_served(args.state_file):
+        print(f"Error: --state-file {args.state_file} is inside {STATIC_DIR}, which is served over HTTP")
+        return
+    scene_store.open(args.scenes_file)
     
     # Check for local URL options
     hostname = get_local_hostname()
@@ -534,14 +2818,19 @@ def main():
     print(f"2. IP address: http://[YOUR_IP]:{args.port} (shown when server starts)")
     print(f"3. Hostname: http://{hostname}.local:{args.port} (works on most modern networks)")
     print()
+    td_port = args.port if args.single_port else args.td_port
+    bridge_config['bridge_id'] = args.bridge_id or f'{hostname}:{td_port}'
     print(f"TOUCHDESIGNER CONFIGURATION:")
     print(f"  WebSocket DAT Settings:")
     print(f"    - Network Address: localhost")
-    print(f"    - Port: {args.td_port}")
+    print(f"    - Port: {td_port}")
     print(f"    - Active: ✓")
     print(f"    - Callbacks DAT: websocket1_callbacks")
     print()
-    print(f"BROWSER CONNECTS TO: ws://localhost:{args.websocket_port}")
+    if args.single_port:
+        print(f"BROWSER CONNECTS TO: ws://localhost:{args.port}{SINGLE_PORT_BROWSER_PATH} (single-port mode)")
+    else:
+        print(f"BROWSER CONNECTS TO: ws://localhost:{args.websocket_port}")
     print("=" * 60)
     
     # Check current directory
@@ -573,8 +2862,21 @@ def main():
     # Show configuration
     print(f"Configuration:")
     print(f"  HTTP Port: {args.port}")
-    print(f"  Browser WebSocket Port: {args.websocket_port}")
-    print(f"  TouchDesigner Port: {args.td_port}")
+    if args.single_port:
+        print(f"  Single-port mode: browsers and TouchDesigner also connect to port {args.port}")
+    else:
+        print(f"  Browser WebSocket Port: {args.websocket_port}")
+        print(f"  TouchDesigner Port: {args.td_port}")
+    if bridge_config['workers']:
+        print(f"  Browser workers: {bridge_config['workers']} processes")
+    print(f"  Event loop: {bridge_config['loop']}, stall logging " + (f"above {args.lag_threshold_ms:g} ms" if args.lag_threshold_ms > 0 else 'off'))
+    print(f"  State coalescing: {'off' if args.no_coalesce or args.coalesce_ms <= 0 else f'{args.coalesce_ms:g} ms'}")
+    print(f"  Heartbeat: {f'ping every {args.ping_interval:g} s, {args.ping_timeout:g} s timeout' if args.ping_interval > 0 else 'off'}")
+    print(f"  Offline grace period: {args.offline_grace:g} s")
+    print(f"  Bridge ID: {bridge_config['bridge_id']}" + (f", peers: {', '.join(args.peer)}" if args.peer else ''))
+    print(f"  Scenes file: {args.scenes_file}")
+    print(f"  State snapshot: {args.state_file or 'off'}" + (f" (every {args.state_interval:g} s)" if args.state_file else ''))
+    print(f"  Client queue high-water: {args.queue_high_water} frames ({args.slow_client_policy} slow browsers)")
     print(f"  Auto-open browser: {'No' if args.no_browser else 'Yes'}")
     print(f"  Find available port: {'Yes' if args.find_port else 'No'}")
     print()
@@ -588,18 +2890,18 @@ def main():
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.bind(('', args.port))
             # Port is available
-            start_server(args.port, args.websocket_port, auto_open)
+            start_server(args.port, args.websocket_port, auto_open, args.td_port, args.single_port)
         except OSError:
             # Port is in use, find alternative
             print(f"Port {args.port} is in use, finding alternative...")
             alternative_port = find_available_port(args.port + 1)
             if alternative_port:
-                start_server(alternative_port, args.websocket_port, auto_open)
+                start_server(alternative_port, args.websocket_port, auto_open, args.td_port, args.single_port)
             else:
                 print("No available ports found!")
     else:
         # Try the specified port, fail if not available
-        start_server(args.port, args.websocket_port, auto_open)
+        start_server(args.port, args.websocket_port, auto_open, args.td_port, args.single_port)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file